@@ -16,22 +16,77 @@ cleaner/
 └── waterlevel_cleaner.py # 包含 WaterlevelCleaner 类
 """
 
+import os
 import xarray as xr
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+
+def _read_csv_arrow(data_path):
+    """用pyarrow读取csv，各列类型与pandas C引擎的推断结果保持一致"""
+    # 站码和时间保持字符串
+    column_types = {"STCD": pa.string(), "TM": pa.string()}
+
+    def _read(types):
+        return pacsv.read_csv(
+            data_path,
+            convert_options=pacsv.ConvertOptions(
+                column_types=types, strings_can_be_null=True
+            ),
+        )
+
+    table = _read(column_types)
+    # pyarrow的推断与pandas不同：全空列为null类型（pandas为float64 NaN），
+    # 日期时间文本会被解析（pandas保留字符串），这些列按pandas的结果重新读取
+    fixed_types = {}
+    for field in table.schema:
+        if pa.types.is_null(field.type):
+            fixed_types[field.name] = pa.float64()
+        elif pa.types.is_temporal(field.type):
+            fixed_types[field.name] = pa.string()
+    if fixed_types:
+        table = _read({**column_types, **fixed_types})
+    return table.to_pandas()
 
 
 class Cleaner:
-    def __init__(self, data_path, *args, **kwargs):
+    def __init__(self, data_path, *args, downcast_float=False, **kwargs):
         self.data_path = data_path
+        # 为True时浮点列读入后转为float32，内存减半；清洗结果会有float32精度误差，默认关闭
+        self.downcast_float = downcast_float
         self.origin_df = None
         self.processed_df = None
         self.read_data()
 
     def read_data(self):
         # 读取数据并存储在origin_df中
-        self.origin_df = pd.read_csv(self.data_path, dtype={"STCD": str}, index_col=False)
-        self.processed_df = self.origin_df.copy()
+        # 首次读取CSV后在旁边写一份parquet缓存，CSV未更新时优先读缓存
+        cache_path = f"{self.data_path}.parquet"
+        if os.path.exists(cache_path) and os.path.getmtime(
+            cache_path
+        ) >= os.path.getmtime(self.data_path):
+            self.origin_df = pd.read_parquet(cache_path)
+        else:
+            try:
+                # pyarrow多线程解析，比默认C引擎快
+                self.origin_df = _read_csv_arrow(self.data_path)
+            except ValueError:
+                # 行尾多分隔符等不规整文件，退回C引擎
+                self.origin_df = pd.read_csv(
+                    self.data_path, dtype={"STCD": str}, index_col=False
+                )
+            try:
+                self.origin_df.to_parquet(cache_path, compression="zstd")
+            except (OSError, TypeError, ValueError):
+                # 缓存写入失败（如目录只读、列类型混杂）不影响正常读取
+                pass
+        if self.downcast_float:
+            float_cols = self.origin_df.select_dtypes("float64").columns
+            self.origin_df[float_cols] = self.origin_df[float_cols].astype(np.float32)
+        # 浅拷贝：processed_df 只新增结果列，不必复制一份原始数据
+        self.processed_df = self.origin_df.copy(deep=False)
 
     def save_data(self, data, output_path):
         # 保存数据到CSV
@@ -442,6 +442,12 @@ def step10_checks_on_overlapping_events(
     # biliu_flow_division.to_csv(os.path.join(definitions.ROOT_DIR, 'example/yingnariver_data/yingna_rain_flow_division/yingna_flow_division.txt'), sep='\t')
 
 
+def _time_to_index(time):
+    """Map each time stamp to its position, so event bounds are looked up
+    without scanning the whole time array for every event."""
+    return {t: i for i, t in enumerate(time)}
+
+
 def baseflow_curve(beginning_flow, end_flow, flow, time):
     baseflow = np.copy(flow)
     beg_end_series = np.array([], dtype=beginning_flow[0].dtype)
@@ -450,11 +456,10 @@ def baseflow_curve(beginning_flow, end_flow, flow, time):
             (beg_end_series, [beginning_flow[j], end_flow[j]])
         )
 
+    time_index = _time_to_index(time)
     for k in range(len(beg_end_series) - 1):
-        index_beg = np.where(time == beg_end_series[k])[0]
-        index_end = np.where(time == beg_end_series[k + 1])[0]
-        index_beg = int(index_beg)
-        index_end = int(index_end)
+        index_beg = time_index[beg_end_series[k]]
+        index_end = time_index[beg_end_series[k + 1]]
         if (
             len(np.where(np.isnan(flow[index_beg : index_end + 1]) == 1)[0])
             >= len(flow[index_beg : index_end + 1]) * 0.9
@@ -531,6 +536,7 @@ def step11_event_analysis(
     volume_rain = np.zeros(len(beginning_rain))
     volume_runoff = np.zeros(len(beginning_flow))
     runoff_ratio = np.zeros(len(beginning_rain))
+    time_index = _time_to_index(time)
     for h in range(len(beginning_rain)):
         duration_rain[h] = (
             (np.datetime64(end_rain[h]) - np.datetime64(beginning_rain[h]))
@@ -542,28 +548,24 @@ def step11_event_analysis(
             / np.timedelta64(1, "s")
             / (60 * 60 * multiple)
         )
-        index_beginning_event = np.where(time == beginning_rain[h])[0]
-        index_end_event = np.where(time == end_rain[h])[0]
-        index_beginning_event = int(index_beginning_event)
-        index_end_event = int(index_end_event)
+        index_beginning_event = time_index[beginning_rain[h]]
+        index_end_event = time_index[end_rain[h]]
         volume_rain[h] = (
             np.nansum(rain[index_beginning_event:index_end_event]) * multiple
         )
 
     if flag == 1:
         for h in range(len(beginning_flow)):
-            index_beginning_event = np.where(time == beginning_flow[h])[0]
-            index_end_event = np.where(time == end_flow[h])[0]
+            index_beginning_event = time_index[beginning_flow[h]]
+            index_end_event = time_index[end_flow[h]]
             volume_runoff[h] = (
                 np.nansum(flow[index_beginning_event:index_end_event]) * multiple
             )
     else:
         baseflow = baseflow_curve(beginning_flow, end_flow, flow, time)
         for h in range(len(beginning_flow)):
-            index_beginning_event = np.where(time == beginning_flow[h])[0]
-            index_end_event = np.where(time == end_flow[h])[0]
-            index_beginning_event = int(index_beginning_event)
-            index_end_event = int(index_end_event)
+            index_beginning_event = time_index[beginning_flow[h]]
+            index_end_event = time_index[end_flow[h]]
 
             q = flow[index_beginning_event:index_end_event]
             qb = baseflow[index_beginning_event:index_end_event]
@@ -584,10 +586,8 @@ def step11_event_analysis(
     )
     drop_list = []
     for i in range(len(beginning_rain)):
-        index_beginning_event = np.where(time == beginning_flow[i])[0]
-        index_end_event = np.where(time == end_flow[i])[0]
-        index_beginning_event = int(index_beginning_event)
-        index_end_event = int(index_end_event)
+        index_beginning_event = time_index[beginning_flow[i]]
+        index_end_event = time_index[end_flow[i]]
         if flow[index_beginning_event:index_end_event].max() < flow_threshold:
             drop_list.append(i)
         if result_df["DURATION_RAIN"].iloc[i] > duration_max:
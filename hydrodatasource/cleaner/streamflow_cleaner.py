@@ -12,13 +12,204 @@ import xarray as xr
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.signal import cwt, morlet, butter, filtfilt
-from scipy.fft import fft, ifft, fftfreq
-from scipy.optimize import curve_fit
+from scipy.signal import butter, sosfiltfilt, fftconvolve
+from scipy.fft import rfft, irfft, rfftfreq
+from numba import njit
 import os
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 
 
+def _morlet(M, w=5.0):
+    """
+    复 Morlet 小波（与已移除的 scipy.signal.morlet(M, w) 相同，s=1，complete=True）。
+    :param M: 小波长度
+    :param w: 中心频率参数
+    """
+    x = np.linspace(-2 * np.pi, 2 * np.pi, M)
+    output = np.exp(1j * w * x) - np.exp(-0.5 * (w**2))
+    output *= np.exp(-0.5 * (x**2)) * np.pi ** (-0.25)
+    return output
+
+
+@njit(cache=True)
+def _kalman_1d(z, Q, R, x0, P0):
+    """
+    标量卡尔曼滤波递推（A=H=1），返回每个时刻的状态估计。
+    :param z: 观测序列（float64 一维数组）
+    :param Q: 过程噪声方差
+    :param R: 观测噪声方差
+    :param x0: 初始状态
+    :param P0: 初始估计误差方差
+    """
+    out = np.empty(z.shape[0], dtype=np.float64)
+    x = x0
+    P = P0
+    for i in range(z.shape[0]):
+        # predict
+        P = P + Q
+        # update
+        K = P / (P + R)
+        x = x + K * (z[i] - x)
+        P = (1.0 - K) * P
+        out[i] = x
+    return out
+
+
+@njit(cache=True)
+def _prefix_sums(values):
+    """
+    一次遍历求去除NaN后的前缀和与非NaN个数的前缀和，长度均为 len(values)+1。
+    """
+    n = values.shape[0]
+    csum = np.empty(n + 1, dtype=np.float64)
+    ccount = np.empty(n + 1, dtype=np.int64)
+    csum[0] = 0.0
+    ccount[0] = 0
+    for i in range(n):
+        if np.isnan(values[i]):
+            csum[i + 1] = csum[i]
+            ccount[i + 1] = ccount[i]
+        else:
+            csum[i + 1] = csum[i] + values[i]
+            ccount[i + 1] = ccount[i] + 1
+    return csum, ccount
+
+
+@njit(cache=True)
+def _window_mean(times, csum, ccount, i, half_window):
+    """
+    以第 i 个时刻为中心、前后各 half_window 小时的窗口均值（忽略NaN），窗口边界按时间戳二分定位。
+    :param times: 有序时间戳（int64 纳秒）
+    :param csum: 去除NaN后的前缀和，长度为 len(times)+1
+    :param ccount: 非NaN个数的前缀和，长度为 len(times)+1
+    """
+    n = times.shape[0]
+    hour = 3600 * 10**9
+    # 计算窗口的起始和结束位置，处理边界情况
+    if i < half_window:
+        start = 0
+    else:
+        start = np.searchsorted(times, times[i] - half_window * hour, "left")
+    if i + half_window >= n:
+        end = n
+    else:
+        end = np.searchsorted(times, times[i] + half_window * hour, "right")
+
+    count = ccount[end] - ccount[start]
+    if count == 0:
+        return np.nan
+    return (csum[end] - csum[start]) / count
+
+
+@njit(cache=True)
+def _adaptive_moving_average(
+    values,
+    times,
+    csum,
+    ccount,
+    threshold,
+    initial_window,
+    min_window,
+    max_window,
+    decay_factor,
+):
+    """
+    自适应窗口滑动平均的递推部分，窗口以小时为单位。
+    :param values: 流量序列
+    :param times: 与 values 对应的有序时间戳（int64 纳秒）
+    """
+    n = values.shape[0]
+    out = np.empty(n, dtype=np.float64)
+    current_window = initial_window
+    for i in range(n):
+        # 调整窗口大小
+        if values[i] >= threshold:
+            current_window = max(min_window, current_window // decay_factor)
+        else:
+            current_window = min(max_window, current_window * decay_factor)
+        out[i] = _window_mean(times, csum, ccount, i, current_window // 2)
+    return out
+
+
+@njit(cache=True)
+def _seasonal_adaptive_moving_average(
+    values,
+    times,
+    csum,
+    ccount,
+    is_wet,
+    threshold,
+    wet_window,
+    dry_window,
+    decay_factor,
+):
+    """
+    汛期/非汛期两套参数的自适应滑动平均，一次遍历完成。
+    两套窗口的递推各自独立演化，每个时刻只按 is_wet 计算所选一套的窗口均值。
+    :param is_wet: 每个时刻是否处于汛期
+    :param wet_window: 汛期 (initial_window, min_window, max_window)
+    :param dry_window: 非汛期 (initial_window, min_window, max_window)
+    """
+    n = values.shape[0]
+    out = np.empty(n, dtype=np.float64)
+    wet_current = wet_window[0]
+    dry_current = dry_window[0]
+    for i in range(n):
+        # 调整窗口大小
+        if values[i] >= threshold:
+            wet_current = max(wet_window[1], wet_current // decay_factor)
+            dry_current = max(dry_window[1], dry_current // decay_factor)
+        else:
+            wet_current = min(wet_window[2], wet_current * decay_factor)
+            dry_current = min(dry_window[2], dry_current * decay_factor)
+        if is_wet[i]:
+            out[i] = _window_mean(times, csum, ccount, i, wet_current // 2)
+        else:
+            out[i] = _window_mean(times, csum, ccount, i, dry_current // 2)
+    return out
+
+
+@njit(cache=True)
+def _balance_windows(values, window_size, stride):
+    """
+    按步幅滚动窗口，用窗口内负值总量按比例扣减正值，再将非正值置0。
+    窗口之间有重叠时按顺序处理，后一个窗口使用前一个窗口调整后的值。
+    :param values: 流量序列，NaN 保持不变
+    :param window_size: 窗口大小
+    :param stride: 步幅
+    """
+    out = values.copy()
+    for i in range(0, out.shape[0] - window_size + 1, stride):
+        pos_sum = 0.0
+        neg_sum = 0.0
+        count = 0
+        for j in range(i, i + window_size):
+            v = out[j]
+            if np.isnan(v):
+                continue
+            count += 1
+            if v > 0:
+                pos_sum += v
+            elif v < 0:
+                neg_sum += v
+        # 如果窗口内全是NaN，保持原窗口
+        if count == 0:
+            continue
+
+        # 计算需要调整的比例，没有正值可用于调整时正值保持原样
+        adjust_factor = abs(neg_sum) / pos_sum if pos_sum > 0 else 0.0
+        for j in range(i, i + window_size):
+            v = out[j]
+            if v > 0:
+                v = v - v * adjust_factor
+            # 调整后不为正的值（含原有负值）置0，NaN 保持不变
+            if v <= 0:
+                v = 0.0
+            out[j] = v
+    return out
+
+
 class StreamflowCleaner(Cleaner):
     def __init__(
         self,
@@ -66,23 +257,31 @@ class StreamflowCleaner(Cleaner):
         :param streamflow_data: 输入的流量数据数组
         :return: 平滑处理后的流量数据
         """
-        # 将流量数据转换为 pandas Series
-        streamflow_series = streamflow_data
-
-        # 应用中心滑动平均
-        smoothed_series = streamflow_series.rolling(
-            window=self.window_size, center=True
-        ).mean()
-
-        # 填充由于滚动窗口导致的起始和结束的 NaN 值
-        smoothed_series.bfill(inplace=True)  # 用后面的值填充前面的 NaN
-        smoothed_series.ffill(inplace=True)  # 用前面的值填充后面的 NaN
+        streamflow_array = np.asarray(streamflow_data, dtype=np.float64)
+        n = len(streamflow_array)
+        smoothed_data = np.full(n, np.nan)
+
+        # 应用中心滑动平均：只计算完整窗口，结果放在窗口中心（与 rolling(center=True) 对齐）
+        if n >= self.window_size:
+            kernel = np.full(self.window_size, 1.0 / self.window_size)
+            full_windows = np.convolve(streamflow_array, kernel, mode="valid")
+            start = self.window_size // 2
+            end = start + len(full_windows)
+            smoothed_data[start:end] = full_windows
+            # 填充由于滚动窗口导致的起始和结束的值
+            smoothed_data[:start] = full_windows[0]
+            smoothed_data[end:] = full_windows[-1]
+
+        if np.isnan(smoothed_data).any():
+            # 原始数据含缺失时，窗口均值中的 NaN 同样前后填充
+            smoothed_data = pd.Series(smoothed_data).bfill().ffill().to_numpy()
 
         # 将平滑数据中的负值置为0
-        smoothed_series[smoothed_series < 0] = 0
+        np.clip(smoothed_data, 0, None, out=smoothed_data)
 
-        # 将结果转换回 numpy 数组
-        smoothed_data = smoothed_series
+        # 保持与输入相同的索引，便于后续方法继续处理
+        if isinstance(streamflow_data, pd.Series):
+            smoothed_data = pd.Series(smoothed_data, index=streamflow_data.index)
 
         return self.data_balanced(streamflow_data, smoothed_data)
 
@@ -91,31 +290,15 @@ class StreamflowCleaner(Cleaner):
         对流量数据应用卡尔曼滤波进行平滑处理，并保持流量总量平衡。
         :param streamflow_data: 原始流量数据
         """
-        A = np.array([[1]])
-        H = np.array([[1]])
-        Q = np.array([[0.01]])
-        R = np.array([[0.01]])
-        X_estimated = np.array([streamflow_data[0]])
-        P_estimated = np.eye(1) * 0.01
-        estimated_states = []
-
-        for measurement in streamflow_data:
-            # predict
-            X_predicted = A.dot(X_estimated)
-            P_predicted = A.dot(P_estimated).dot(A.T) + Q
-
-            # update
-            measurement_residual = measurement - H.dot(X_predicted)
-            S = H.dot(P_predicted).dot(H.T) + R
-            K = P_predicted.dot(H.T).dot(np.linalg.inv(S))  # kalman gain
-            X_estimated = X_predicted + K.dot(measurement_residual)
-            P_estimated = P_predicted - K.dot(H).dot(P_predicted)
-            estimated_states.append(X_estimated.item())
-
-        estimated_states = np.array(estimated_states)
+        # A = H = 1，各矩阵均为 1x1，直接以标量递推
+        Q = 0.01  # 过程噪声方差
+        R = 0.01  # 观测噪声方差
+        P0 = 0.01  # 初始估计误差方差
+        z = np.asarray(streamflow_data, dtype=np.float64)
+        estimated_states = _kalman_1d(z, Q, R, z[0], P0)
 
         # Apply non-negative constraints
-        estimated_states[estimated_states < 0] = 0
+        np.maximum(estimated_states, 0, out=estimated_states)
         return self.data_balanced(streamflow_data, estimated_states)
 
     def adjust_window(self, window):
@@ -125,6 +308,23 @@ class StreamflowCleaner(Cleaner):
         return adjusted_window.mean()  # 返回窗口的平均值或其他适当的聚合值
 
     def rolling_with_stride(self, df, func):
+        if func == self.adjust_window:
+            # adjust_window 即忽略NaN的窗口均值，直接用滑动窗口视图一次性计算
+            arr = np.asarray(df, dtype=np.float64)
+            out = np.full(len(arr), np.nan)
+            if len(arr) >= self.window_size:
+                windows = np.lib.stride_tricks.sliding_window_view(
+                    arr, self.window_size
+                )[:: self.stride]
+                valid = ~np.isnan(windows)
+                counts = valid.sum(axis=1)
+                sums = np.where(valid, windows, 0.0).sum(axis=1)
+                means = np.full(len(windows), np.nan)
+                np.divide(sums, counts, out=means, where=counts > 0)
+                # 仅在窗口中心索引处填充结果
+                out[self.window_size // 2 :: self.stride][: len(means)] = means
+            return pd.Series(out, index=df.index)
+
         # 初始化与原始 DataFrame 长度相同的 NaN 序列
         results = pd.Series(np.nan, index=df.index)
         # 遍历数据，步长为stride
@@ -170,23 +370,29 @@ class StreamflowCleaner(Cleaner):
     def robust_fitting(self, streamflow_data, k=1.5):
         """
         对流量数据应用抗差修正算法进行平滑处理，并保持流量总量平衡。
-        默认采用二次曲线进行拟合优化，该算法处理性能较差
+        默认采用二次曲线进行拟合优化
         """
-        time_steps = np.arange(len(streamflow_data))
-        params, _ = curve_fit(self.quadratic_function, time_steps, streamflow_data)
+        streamflow_array = np.asarray(streamflow_data, dtype=np.float64)
+        time_steps = np.arange(len(streamflow_array))
+        # 二次曲线对参数是线性的，直接最小二乘求解即可
+        params = np.polyfit(time_steps, streamflow_array, 2)
         smoothed_streamflow = self.quadratic_function(time_steps, *params)
-        residuals = streamflow_data - smoothed_streamflow
-        m = len(streamflow_data)
-        sigma = np.sqrt(np.sum(residuals**2) / (m - 1))
+        residuals = streamflow_array - smoothed_streamflow
+        abs_residuals = np.abs(residuals)
+        squared_residuals = residuals**2
+        m = len(streamflow_array)
+        sigma = np.sqrt(np.sum(squared_residuals) / (m - 1))
 
         for _ in range(10):
             weights = np.where(
-                np.abs(residuals) <= k * sigma, 1, k * sigma / np.abs(residuals)
+                abs_residuals <= k * sigma,
+                1.0,
+                k * sigma / np.maximum(abs_residuals, np.finfo(np.float64).tiny),
             )
-            sigma = np.sqrt(np.sum(weights * residuals**2) / (m - 1))
+            sigma = np.sqrt(np.sum(weights * squared_residuals) / (m - 1))
 
         corrected_streamflow = (
-            weights * streamflow_data + (1 - weights) * smoothed_streamflow
+            weights * streamflow_array + (1 - weights) * smoothed_streamflow
         )
         corrected_streamflow[corrected_streamflow < 0] = 0
         return self.data_balanced(streamflow_data, corrected_streamflow)
@@ -202,8 +408,11 @@ class StreamflowCleaner(Cleaner):
         def apply_low_pass_filter(signal, cutoff_frequency, sampling_rate, order=5):
             nyquist_frequency = 0.5 * sampling_rate
             normalized_cutoff = cutoff_frequency / nyquist_frequency
-            b, a = butter(order, normalized_cutoff, btype="low", analog=False)
-            filtered_signal = filtfilt(b, a, signal)
+            # 二阶节级联形式，高阶时数值更稳定
+            sos = butter(
+                order, normalized_cutoff, btype="low", analog=False, output="sos"
+            )
+            filtered_signal = sosfiltfilt(sos, signal)
             return filtered_signal
 
         # Apply a low-pass filter
@@ -224,24 +433,31 @@ class StreamflowCleaner(Cleaner):
         :iterations: 迭代次数。
         """
         current_signal = streamflow_data.to_numpy().copy()
+        # 原始总量与频率轴在迭代中不变，只需计算一次
+        total_before = np.sum(streamflow_data)
+        n = len(current_signal)
+        # 实信号只需计算非负频率部分
+        xf = rfftfreq(n, d=self.time_step)
+        high_frequency = xf > self.cutoff_frequency
 
         for _ in range(self.iterations):
-            n = len(current_signal)
-            yf = fft(current_signal)
-            xf = fftfreq(n, d=self.time_step)
+            yf = rfft(current_signal, workers=-1)
 
             # Applied frequency filtering
-            yf[np.abs(xf) > self.cutoff_frequency] = 0
+            yf[high_frequency] = 0
 
-            # FFT and take the real part
-            filtered_signal = ifft(yf).real
+            # Inverse real FFT back to the time domain
+            filtered_signal = irfft(yf, n=n, workers=-1, overwrite_x=True)
 
             # Apply non-negative constraints
-            filtered_signal[filtered_signal < 0] = 0
+            np.clip(filtered_signal, 0, None, out=filtered_signal)
 
             # Adjust the total flow to match the original flow
-            current_signal = self.data_balanced(streamflow_data, filtered_signal)
+            filtered_signal *= total_before / np.sum(filtered_signal)
+            current_signal = filtered_signal
 
+        print(f"Total flow (before smoothing): {total_before}")
+        print(f"Total flow (after smoothing): {np.sum(current_signal)}")
         return current_signal
 
     def wavelet(self, streamflow_data):
@@ -262,19 +478,26 @@ class StreamflowCleaner(Cleaner):
                 ),  # Expand the last 24 lines with the last element
             ]
         )
-        widths = np.arange(1, 31)
-        # Wavelet transform by Morlet wavelet directly
-        extended_cwt = cwt(extended_data, morlet, widths)
-        scaled_cwtmatr = np.abs(extended_cwt)
-
         # Select a specific width for analysis (can be briefly understood as selecting a cutoff frequency)
-        cwt_row_extended = scaled_cwtmatr[self.cwt_row, :]
+        # widths 为 1..30，因此第 cwt_row 行对应宽度 cwt_row + 1，只需计算这一行
+        width = self.cwt_row + 1
+        # Wavelet transform by Morlet wavelet directly, same kernel as scipy.signal.cwt
+        kernel_length = min(10 * width, len(extended_data))
+        kernel = np.conj(_morlet(kernel_length, width)[::-1])
+        cwt_row_extended = np.abs(fftconvolve(extended_data, kernel, mode="same"))
 
         # Remove the extended part
         adjusted_cwt_row = cwt_row_extended[24:-24]
         adjusted_cwt_row[adjusted_cwt_row < 0] = 0
         return self.data_balanced(streamflow_data, adjusted_cwt_row)
 
+    def _window_prefix_sums(self, streamflow_data):
+        # 窗口均值用前缀和在 O(1) 内求出，NaN 不参与求和与计数（与 Series.mean 一致）
+        values = streamflow_data.to_numpy(dtype=np.float64)
+        csum, ccount = _prefix_sums(values)
+        times = streamflow_data.index.values.astype("datetime64[ns]").view(np.int64)
+        return values, times, csum, ccount
+
     def adaptive_moving_average(
         self,
         streamflow_data,
@@ -288,83 +511,98 @@ class StreamflowCleaner(Cleaner):
         if not isinstance(streamflow_data, pd.Series):
             raise ValueError("输入的数据必须是 pandas Series")
 
-        # 创建一个与原始数据长度相同的Series
-        smoothed_data = pd.Series(index=streamflow_data.index, dtype=float)
-        current_window = initial_window
-
-        for i, date in enumerate(streamflow_data.index):
-            # 获取当前处理节点的值
-            current_value = streamflow_data[date]
-
-            # 调整窗口大小
-            if current_value >= threshold:
-                current_window = max(min_window, current_window // decay_factor)
-            else:
-                current_window = min(max_window, current_window * decay_factor)
-
-            half_window = current_window // 2
-
-            # 计算窗口的起始和结束时间，处理边界情况
-            if i < half_window:
-                start_date = streamflow_data.index[0]
-            else:
-                start_date = date - pd.DateOffset(hours=half_window)
-
-            if i + half_window >= len(streamflow_data):
-                end_date = streamflow_data.index[-1]
-            else:
-                end_date = date + pd.DateOffset(hours=half_window)
+        values, times, csum, ccount = self._window_prefix_sums(streamflow_data)
+        smoothed_values = _adaptive_moving_average(
+            values,
+            times,
+            csum,
+            ccount,
+            threshold,
+            initial_window,
+            min_window,
+            max_window,
+            decay_factor,
+        )
+        return pd.Series(smoothed_values, index=streamflow_data.index)
 
-            # 计算窗口内的平均值
-            window_data = streamflow_data[start_date:end_date]
-            smoothed_value = window_data.mean()
-            smoothed_data.loc[date] = smoothed_value
+    def seasonal_adaptive_moving_average(
+        self,
+        streamflow_data,
+        wet_months=(5, 6, 7, 8, 9, 10),
+        threshold=200,
+        wet_window=(56, 4, 56),
+        dry_window=(140, 28, 140),
+        decay_factor=2,
+    ):
+        """
+        汛期与非汛期分别采用不同窗口参数的自适应滑动平均，等价于分别计算两次再按月份选择。
+        :wet_months: 汛期月份
+        :wet_window: 汛期 (initial_window, min_window, max_window)
+        :dry_window: 非汛期 (initial_window, min_window, max_window)
+        """
+        if not isinstance(streamflow_data, pd.Series):
+            raise ValueError("输入的数据必须是 pandas Series")
 
-        return smoothed_data
+        values, times, csum, ccount = self._window_prefix_sums(streamflow_data)
+        is_wet = np.isin(streamflow_data.index.month, wet_months)
+        smoothed_values = _seasonal_adaptive_moving_average(
+            values,
+            times,
+            csum,
+            ccount,
+            is_wet,
+            threshold,
+            np.asarray(wet_window, dtype=np.int64),
+            np.asarray(dry_window, dtype=np.int64),
+            decay_factor,
+        )
+        return pd.Series(smoothed_values, index=streamflow_data.index)
 
     # 使用中心滑动平均处理洪水期间数据
     def update_flood_periods_with_moving_average(
         self, combined_df, flow_division, window_size=1, columns=None
     ):
-        for _, row in flow_division.iterrows():
-            start_time = row["BEGINNING_FLOW"]
-            end_time = row["END_FLOW"]
-            mask = (combined_df.index >= start_time) & (combined_df.index <= end_time)
-            combined_df.loc[mask, columns] = self.moving_average(
-                combined_df.loc[mask, "INQ"], window_size
+        # 一次性定位每个时刻所属的洪水场次（场次之间不应重叠），不在场次内的为 -1
+        flood_periods = pd.IntervalIndex.from_arrays(
+            flow_division["BEGINNING_FLOW"], flow_division["END_FLOW"], closed="both"
+        )
+        flood_id = flood_periods.get_indexer(combined_df.index)
+        mask = flood_id >= 0
+        # 各场次分别计算中心滑动平均
+        combined_df.loc[mask, columns] = (
+            combined_df.loc[mask, "INQ"]
+            .groupby(flood_id[mask])
+            .transform(
+                lambda flood: flood.rolling(
+                    window_size, center=True, min_periods=1
+                ).mean()
             )
+            .to_numpy()
+        )
         return combined_df
 
     def EMA(self, streamflow_data):
-        # 访问时间序列
-        df = self.origin_df.copy()
-
-        # streamflow_data数据是插补过的
-        df["INQQ"] = np.nan
-        df["INQQ"] = streamflow_data
-
-        # 将 'TM' 列转换为日期时间格式
-        df["TM"] = pd.to_datetime(df["TM"], errors="coerce")
+        # 访问时间序列，只取 TM 列，不复制整个 DataFrame
+        tm = pd.to_datetime(self.origin_df["TM"], errors="coerce")
 
-        # 设置 'TM' 列为索引
-        df.set_index("TM", inplace=True)
+        # 去重时间，保留最后一个
+        keep = ~tm.duplicated(keep="last").to_numpy()
 
-        # 去重索引，保留最后一个
-        df = df[~df.index.duplicated(keep="last")]
-
-        # 分段处理
-        # 计算不同窗口的滑动平均
-        df["INQA"] = self.adaptive_moving_average(
-            df["INQQ"], threshold=200, initial_window=56, min_window=4, max_window=56
-        )
-        df["INQB"] = self.adaptive_moving_average(
-            df["INQQ"], threshold=200, initial_window=140, min_window=28, max_window=140
+        # streamflow_data数据是插补过的
+        inqq = pd.Series(
+            np.asarray(streamflow_data, dtype=np.float64)[keep],
+            index=pd.DatetimeIndex(tm[keep]),
         )
 
-        # 创建新的INQQ列，根据月份替换数据
-        df["INQC"] = np.where(
-            df.index.month.isin([5, 6, 7, 8, 9, 10]), df["INQA"], df["INQB"]
-        )
+        # 分段处理
+        # 汛期（5-10月）与非汛期采用不同窗口的滑动平均，一次遍历得到INQC
+        inqc = self.seasonal_adaptive_moving_average(
+            inqq,
+            wet_months=[5, 6, 7, 8, 9, 10],
+            threshold=200,
+            wet_window=(56, 4, 56),
+            dry_window=(140, 28, 140),
+        ).to_numpy()
 
         # 处理场次洪水部分
         # flow_division_path = 'biliu_flow_division.csv'  # 洪水场次数据文件路径
@@ -375,13 +613,10 @@ class StreamflowCleaner(Cleaner):
         # 更新洪水期间的 INQ 数据
         # df['INQD'] =df['INQC']
         # df = self.update_flood_periods_with_moving_average(df, flow_division,columns = 'INQC', window_size=1)
-        # 合并滑动平均结果到 EMA 列
-        df["EMA"] = df["INQC"]
-
-        # 进行总量平衡
-        df["EMA"] = self.data_balanced(streamflow_data, df["EMA"])
+        # 进行总量平衡，结果与 origin_df 的行索引对齐
+        ema = self.data_balanced(streamflow_data, inqc)
 
-        return df["EMA"]
+        return pd.Series(ema, index=self.origin_df.index[keep])
 
     def anomaly_process(self, methods=None):
         super().anomaly_process(methods)
@@ -417,7 +652,6 @@ class StreamflowCleaner(Cleaner):
                 streamflow_data.fillna(self.origin_df["INQ"], inplace=True)
             elif method == "EMA":
                 streamflow_data = self.EMA(streamflow_data=streamflow_data)
-                streamflow_data.index = self.origin_df["INQ"].index
 
             else:
                 print("please check your method name")
@@ -426,7 +660,7 @@ class StreamflowCleaner(Cleaner):
         self.processed_df[methods[0]] = streamflow_data
 
         # 去除提前插补的缺失值
-        self.processed_df[methods[0]][self.origin_df["INQ"].isna()] = np.nan
+        self.processed_df.loc[self.origin_df["INQ"].isna(), methods[0]] = np.nan
 
 
 class StreamflowBacktrack:
@@ -435,27 +669,35 @@ class StreamflowBacktrack:
         self.output_folder = data_folder
         self.file_name = file_name
 
+    def read_csv(self, file_path, **kwargs):
+        # 使用 pyarrow 引擎多线程解析CSV
+        return pd.read_csv(file_path, engine="pyarrow", **kwargs)
+
     def clean_W(self, file_path, output_folder):
-        data = pd.read_csv(file_path)
+        data = self.read_csv(file_path)
+        w = data["W"].to_numpy(dtype=np.float64)
+        # 相邻两行的差异，一次计算同时用于前后两个方向
+        diff = np.abs(np.diff(w))
         # 计算与前一行的差异
-        data["diff_prev"] = abs(data["W"] - data["W"].shift(1))
-
+        diff_prev = np.concatenate([[np.nan], diff])
         # 计算与后一行的差异
-        data["diff_next"] = abs(data["W"] - data["W"].shift(-1))
+        diff_next = np.concatenate([diff, [np.nan]])
+
+        # 标记需要设置为 NaN 的行：与前一行或后一行的差异超过200
+        set_nan = (diff_prev > 200) | (diff_next > 200)
 
-        # 标记需要设置为 NaN 的行
-        data["set_nan"] = (data["diff_prev"] > 200) | (data["diff_next"] > 200)
+        data.loc[set_nan, "W"] = np.nan
 
-        # 如果与前一行或后一行的差异超过200，则设置为 NaN
-        data.loc[data["set_nan"], "W"] = np.nan
+        # 被设置为 NaN 的行（保留差异信息便于核查）
+        outliers = data[set_nan].assign(
+            diff_prev=diff_prev[set_nan], diff_next=diff_next[set_nan], set_nan=True
+        )
 
         # 输出被设置为 NaN 的行
-        print(data[data["set_nan"]])
+        print(outliers)
 
         # 保存被设置为 NaN 的行到 CSV 文件
-        data[data["set_nan"]].to_csv(
-            os.path.join(output_folder, "库容异常的数据行.csv"), index=False
-        )
+        outliers.to_csv(os.path.join(output_folder, "库容异常的数据行.csv"), index=False)
         # 绘制图形
         # plt.figure(figsize=(14, 7))
         # plt.plot(data["TM"], data["W"], label="Water Level")
@@ -471,8 +713,7 @@ class StreamflowBacktrack:
 
     def back_calculation(self,data_path, file, output_folder):
         # 反推数据
-        data = pd.read_csv(data_path)
-        data["TM"] = pd.to_datetime(data["TM"])
+        data = self.read_csv(data_path, parse_dates=["TM"])
         data["Time_Diff"] = data["TM"].diff().dt.total_seconds().fillna(0)
         data["INQ_ACC"] = data["OTQ"] + (10**6 * (data["W"].diff() / data["Time_Diff"]))
         data["INQ_CB"] = data["INQ"].fillna(data["INQ_ACC"])
@@ -500,9 +741,8 @@ class StreamflowBacktrack:
 
     def delete_nan_inq(self,data_path, file, output_folder):
         # 读取CSV文件到DataFrame
-        df = pd.read_csv(data_path)
-        # 将'TM'列转换为日期时间格式并设置为索引
-        df["TM"] = pd.to_datetime(df["TM"])
+        # 读取时即将'TM'列解析为日期时间格式
+        df = self.read_csv(data_path, parse_dates=["TM"])
 
         # 设置调整后的时间为索引
         df = df.set_index("TM")
@@ -511,42 +751,10 @@ class StreamflowBacktrack:
         # 确保'INQ'列是数值类型
         df["INQ"] = pd.to_numeric(df["INQ"], errors="coerce")
 
-        def adjust_window(window):
-            if window.count() == 0:
-                return window  # 如果窗口内全是NaN，返回原窗口
-
-            # 移除负值
-            positive_values = window[window > 0]
-            negative_values = window[window < 0]
-
-            # 计算正负值的总和
-            pos_sum = positive_values.sum()
-            neg_sum = abs(negative_values.sum())  # 负值的绝对值和
-
-            # 计算需要调整的比例
-            if pos_sum > 0:
-                adjust_factor = neg_sum / pos_sum
-                # 调整正值
-                adjusted_values = positive_values - (positive_values * adjust_factor)
-            else:
-                adjusted_values = positive_values  # 如果没有正值可用于调整，保持原样
-
-            # 更新窗口的值
-            window[window > 0] = adjusted_values
-            window[window <= 0] = 0
-
-            return window
-
-        def rolling_with_stride(df, column, window_size, stride, func):
-            # 遍历数据，步长为stride
-            for i in range(0, len(df) - window_size + 1, stride):
-                window_indices = range(i, i + window_size)
-                df.loc[df.index[window_indices], column] = func(
-                    df.loc[df.index[window_indices], column]
-                )
-
-        # 应用滚动窗口函数，这里设置步幅为4，窗口大小为7
-        rolling_with_stride(df, "INQ", window_size=7, stride=4, func=adjust_window)
+        # 应用滚动窗口水量平衡，这里设置步幅为4，窗口大小为7
+        df["INQ"] = _balance_windows(
+            df["INQ"].to_numpy(dtype=np.float64), window_size=7, stride=4
+        )
         path = os.path.join(output_folder, file[:-4] + "_水量平衡后的日尺度反推数据.csv")
 
         df["TM"] = df.index.strftime("%Y-%m-%d %H:%M:%S")
@@ -569,9 +777,8 @@ class StreamflowBacktrack:
 
     def insert_inq(self,data_path, file, output_folder):
         # 读取CSV文件到DataFrame
-        df = pd.read_csv(data_path)
-        # 将'TM'列转换为日期时间格式并设置为索引
-        df["TM"] = pd.to_datetime(df["TM"])
+        # 读取时即将'TM'列解析为日期时间格式
+        df = self.read_csv(data_path, parse_dates=["TM"])
         # 设置调整后的时间为索引
         df = df.set_index("TM")
         # 确保'INQ'列是数值类型
@@ -588,23 +795,15 @@ class StreamflowBacktrack:
         # 插值前检查连续缺失是否超过7天（7*24小时）
         def linear_interpolate(df, column="INQ", threshold=168):
             data = df[column]
-            start_index = None
-
-            for i in range(len(data)):
-                if not pd.isna(data.iloc[i]):
-                    if start_index is None:
-                        start_index = i
-                    else:
-                        # 检查当前点和上一个有数据点之间的间隔
-                        if i - start_index - 1 < threshold:
-                            # 如果间隔小于阈值，进行插值
-                            data.iloc[start_index : i + 1] = data.iloc[
-                                start_index : i + 1
-                            ].interpolate()
-                        # 更新起始点为当前点
-                        start_index = i
-
-            df[column] = data
+            # 一次性对所有内部缺失段按位置线性插值
+            interpolated = data.interpolate(limit_area="inside").to_numpy(copy=True)
+            # 连续缺失不少于阈值的段落恢复为缺失
+            valid_index = np.flatnonzero(data.notna().to_numpy())
+            gaps = np.diff(valid_index) - 1
+            for k in np.flatnonzero(gaps >= threshold):
+                interpolated[valid_index[k] + 1 : valid_index[k + 1]] = np.nan
+
+            df[column] = interpolated
             return df
 
         df = linear_interpolate(df)
@@ -636,44 +835,32 @@ class StreamflowBacktrack:
                 "BLRZ",
             ]
         ].to_csv(result_path, index=False)
-        df[
-            [
-                "STCD",
-                "TM",
-                "RZ",
-                "INQ",
-                "W",
-                "OTQ",
-                "RWCHRCD",
-                "RWPTN",
-                "INQDR",
-                "MSQMT",
-                "BLRZ",
-            ]
-        ].to_csv(
-            os.path.join(
-                "/home/liutianxv1/水库流量数据小时插值并保持水量平衡版本", file
-            ),
-            index=False,
-        )
 
         return result_path
 
-    def process_backtrack(self):
-        for file in tqdm(os.listdir(self.data_folder)):
-            if file.endswith(".csv"):
-                file_path = os.path.join(self.data_folder, file)
-                output_folder = os.path.join(self.output_folder, file[:-4])
-                if not os.path.exists(output_folder):
-                    os.makedirs(output_folder)
-                # Process each file step by step
-                # 去除库容异常
-                cleaned_data = self.clean_W(file_path, output_folder)
-                # 公式计算反推
-                back_data = self.back_calculation(cleaned_data, file, output_folder)
-                # 去除反推异常值
-                nonan_data = self.delete_nan_inq(back_data, file, output_folder)
-                # 插值平衡
-                #insert_data = self.insert_inq(nonan_data, file, output_folder)
-                # 绘图
-                
+    def _process_one(self, file):
+        file_path = os.path.join(self.data_folder, file)
+        output_folder = os.path.join(self.output_folder, file[:-4])
+        if not os.path.exists(output_folder):
+            os.makedirs(output_folder)
+        # Process each file step by step
+        # 去除库容异常
+        cleaned_data = self.clean_W(file_path, output_folder)
+        # 公式计算反推
+        back_data = self.back_calculation(cleaned_data, file, output_folder)
+        # 去除反推异常值
+        nonan_data = self.delete_nan_inq(back_data, file, output_folder)
+        # 插值平衡
+        #insert_data = self.insert_inq(nonan_data, file, output_folder)
+        # 绘图
+        return nonan_data
+
+    def process_backtrack(self, max_workers=None):
+        # 各文件相互独立，按文件分发到多个进程并行处理
+        csv_files = [
+            file for file in os.listdir(self.data_folder) if file.endswith(".csv")
+        ]
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            return list(
+                tqdm(executor.map(self._process_one, csv_files), total=len(csv_files))
+            )
@@ -196,8 +196,8 @@ def make_merge_dataset(
         end_time = pd.to_datetime(time_num[1])
     time_range = pd.date_range(start=start_time, end=end_time, freq="H")
 
-    # 创建一个空的 xarray 数据集来存储结果
-    combined_data = xr.Dataset()
+    # 逐小时的结果先放进列表，最后一次性拼接
+    hourly_data_list = []
 
     # 循环处理每个小时的数据
     for specified_time in time_range:
@@ -230,12 +230,17 @@ def make_merge_dataset(
             + pd.Timedelta(hours=time_now_length)
         )
         combined_hourly_data.coords["time_now"] = time_now_hour
-        combined_hourly_data = combined_hourly_data.expand_dims("time_now")
-
-        # 合并到结果数据集中
-        combined_data = xr.merge(
-            [combined_data, combined_hourly_data], combine_attrs="override"
-        )
+        # 只在筛选后的小数据上扩展维度
+        hourly_data_list.append(combined_hourly_data.expand_dims("time_now"))
+
+    if not hourly_data_list:
+        return xr.Dataset()
+    # 沿 time_now 一次拼接，避免每小时都与累积结果 merge
+    combined_data = xr.concat(
+        hourly_data_list, dim="time_now", join="outer", combine_attrs="override"
+    )
+    # 与原先从空数据集开始 merge 的结果一致，不带全局属性
+    combined_data.attrs = {}
     return combined_data
 
 
@@ -267,13 +272,13 @@ def make1nc41basin(
         gpm_data = (
             make_gpm_dataset(time_periods, dataset, mask)
             if gpm_path is None
-            else xr.open_dataset(gpm_path)
+            else xr.open_dataset(gpm_path, chunks={})
         )
         mask = gen_single_mask(basin_id, shp_path, "gfs", mask_path)
         gfs_data = (
             make_gfs_dataset(time_periods, dataset, mask)
             if gfs_path is None
-            else xr.open_dataset(gfs_path)
+            else xr.open_dataset(gfs_path, chunks={})
         )
 
     data_functions = {
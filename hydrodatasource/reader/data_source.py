@@ -1,4 +1,6 @@
 import collections
+import functools
+import io
 import json
 import os
 import re
@@ -6,7 +8,9 @@ import numpy as np
 import pandas as pd
 import xarray as xr
 from abc import ABC
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
+from fsspec.core import strip_protocol
 
 from hydroutils import hydro_file
 from hydroutils.hydro_time import generate_start0101_time_range
@@ -24,6 +28,80 @@ from hydrodatasource.utils.utils import (
 from hydrodatasource.reader import access_fs
 
 CACHE_DIR = hydro_file.get_cache_dir()
+# number of basin files fetched per request when reading timeseries from MinIO
+PREFETCH_WINDOW = 64
+
+
+def _sorted_intersect(date, t_range):
+    """Indices of the common values of two time arrays.
+
+    Same result as ``np.intersect1d(date, t_range, return_indices=True)[1:]``,
+    but when ``date`` is strictly increasing (as basin timeseries files are) it is
+    found with a binary search into the already sorted ``t_range`` instead of
+    sorting both arrays again.
+
+    Parameters
+    ----------
+    date : np.ndarray
+        times of one basin's records
+    t_range : np.ndarray
+        sorted target times
+
+    Returns
+    -------
+    tuple
+        indices into ``date`` and into ``t_range`` of the common times
+    """
+    if len(date) > 1 and not np.all(date[1:] > date[:-1]):
+        _, ind1, ind2 = np.intersect1d(date, t_range, return_indices=True)
+        return ind1, ind2
+    pos = np.searchsorted(t_range, date)
+    in_range = pos < len(t_range)
+    in_range[in_range] = t_range[pos[in_range]] == date[in_range]
+    return np.nonzero(in_range)[0], pos[in_range]
+
+
+def _list_batch_files(pattern):
+    """Paths of the files in CACHE_DIR whose names match a compiled pattern.
+
+    Parameters
+    ----------
+    pattern : re.Pattern
+        compiled regex for the batch file names
+
+    Returns
+    -------
+    list
+        full paths of the matched files
+    """
+    with os.scandir(CACHE_DIR) as entries:
+        return [
+            os.path.join(CACHE_DIR, entry.name)
+            for entry in entries
+            if pattern.match(entry.name)
+        ]
+
+
+@functools.lru_cache(maxsize=16)
+def _read_units_info(unit_file):
+    """Load a units_info json file, local or on MinIO.
+
+    The result is cached per file, so callers must not modify it.
+
+    Parameters
+    ----------
+    unit_file : str
+        path of the units_info json file
+
+    Returns
+    -------
+    dict
+        variable name -> unit
+    """
+    if "s3://" in unit_file:
+        with conf.FS.open(unit_file, mode="rb") as fp:
+            return json.load(fp)
+    return hydro_file.unserialize_json(unit_file)
 
 
 class HydroData(ABC):
@@ -84,6 +162,19 @@ class SelfMadeHydroDataset(HydroData):
             self.download_data_source()
         self.camels_sites = self.read_site_info()
         self.time_unit = time_unit
+        # filled on the first call of get_timeseries_cols
+        self._timeseries_cols = None
+
+    @functools.cached_property
+    def _basin_offsets(self):
+        """UTC offsets (hours) of all basins, computed once from basinoutlets.shp"""
+        basinoutlets_path = os.path.join(
+            self.data_source_description["SHAPE_DIR"], "basinoutlets.shp"
+        )
+        try:
+            return calculate_basin_offsets(basinoutlets_path)
+        except:
+            raise FileNotFoundError(f"basinoutlets.shp not found in {basinoutlets_path}.")
 
     @property
     def streamflow_unit(self):
@@ -111,6 +202,17 @@ class SelfMadeHydroDataset(HydroData):
                 if os.path.isdir(os.path.join(ts_dir, name))
             ]
         unit_files = [folder + "_units_info.json" for folder in time_units_dir]
+        # look-up tables from a time unit to its directory / units_info file
+        ts_dir_by_unit = {
+            tu: next(d for d in time_units_dir if tu in d)
+            for tu in ["1h", "3h", "1D", "8D"]
+            if any(tu in d for d in time_units_dir)
+        }
+        unit_file_by_unit = {
+            tu: next(f for f in unit_files if tu in f)
+            for tu in ["1h", "3h", "1D", "8D"]
+            if any(tu in f for f in unit_files)
+        }
         attr_dir = os.path.join(data_root_dir, "attributes")
         attr_file = os.path.join(attr_dir, "attributes.csv")
         shape_dir = os.path.join(data_root_dir, "shapes")
@@ -118,9 +220,11 @@ class SelfMadeHydroDataset(HydroData):
         return collections.OrderedDict(
             DATA_DIR=data_root_dir,
             TS_DIRS=time_units_dir,
+            TS_DIR_BY_UNIT=ts_dir_by_unit,
             ATTR_DIR=attr_dir,
             ATTR_FILE=attr_file,
             UNIT_FILES=unit_files,
+            UNIT_FILE_BY_UNIT=unit_file_by_unit,
             SHAPE_DIR=shape_dir,
         )
 
@@ -163,6 +267,7 @@ class SelfMadeHydroDataset(HydroData):
         time_units = kwargs.get("time_units", ["1D"])
         region = kwargs.get("region", None)
         start0101_freq = kwargs.get("start0101_freq", False)
+        num_workers = kwargs.get("num_workers", 16)
 
         results = {}
 
@@ -171,20 +276,8 @@ class SelfMadeHydroDataset(HydroData):
             # and for 3h time unit, set True
             offset_to_utc = time_unit == "3h"
             if offset_to_utc:
-                basinoutlets_path = os.path.join(
-                    self.data_source_description["SHAPE_DIR"], "basinoutlets.shp"
-                )
-                try:
-                    offset_dict = calculate_basin_offsets(basinoutlets_path)
-                except:
-                    raise FileNotFoundError(
-                        f"basinoutlets.shp not found in {basinoutlets_path}."
-                    )
-            ts_dir = next(
-                dir_path
-                for dir_path in self.data_source_description["TS_DIRS"]
-                if time_unit in dir_path
-            )
+                offset_dict = self._basin_offsets
+            ts_dir = self.data_source_description["TS_DIR_BY_UNIT"][time_unit]
             if start0101_freq:
                 t_range = generate_start0101_time_range(
                     start_time=t_range_list[0],
@@ -196,34 +289,149 @@ class SelfMadeHydroDataset(HydroData):
                     start=t_range_list[0], end=t_range_list[-1], freq=time_unit
                 )
             nt = len(t_range)
-            x = np.full([len(object_ids), nt, len(relevant_cols)], np.nan)
+            # filled basin by basin below; only basins not covering the whole
+            # t_range get NaN-initialized
+            x = np.empty([len(object_ids), nt, len(relevant_cols)], dtype=np.float32)
+            # which columns need the precipitation / ERA5-Land ET post-processing,
+            # the MODIS ones still go through _read_timeseries_1basin1var
+            is_prcp = np.array(
+                ["precipitation" in col for col in relevant_cols], dtype=bool
+            )
+            is_et = ~is_prcp & np.isin(relevant_cols, ERA5LAND_ET_REALATED_VARS)
+            modis_cols = [
+                j
+                for j, col in enumerate(relevant_cols)
+                if not (is_prcp[j] or is_et[j]) and col in MODIS_ET_PET_8D_VARS
+            ]
 
-            for k in tqdm(
-                range(len(object_ids)), desc=f"Reading timeseries data with {time_unit}"
-            ):
-                prefix_ = "" if region is None else region + "_"
-                ts_file = os.path.join(
-                    ts_dir,
-                    prefix_ + object_ids[k] + ".csv",
-                )
-                if "s3://" in ts_file:
-                    with conf.FS.open(ts_file, mode="rb") as f:
-                        ts_data = pd.read_csv(f)
-                else:
-                    ts_data = pd.read_csv(ts_file)
+            prefix_ = "" if region is None else region + "_"
+            t_vals = t_range.values
+            rc_list = list(relevant_cols)
+
+            def _ts_file(k):
+                return os.path.join(ts_dir, prefix_ + object_ids[k] + ".csv")
+
+            def _load_basin(k, content=None):
+                ts_data = self._read_ts_csv(_ts_file(k), content, rc_list)
                 date = pd.to_datetime(ts_data["time"]).values
                 if offset_to_utc:
                     date = date - np.timedelta64(offset_dict[object_ids[k]], "h")
-                [_, ind1, ind2] = np.intersect1d(date, t_range, return_indices=True)
-
-                for j in range(len(relevant_cols)):
-                    tmp_ = self._read_timeseries_1basin1var(ts_data, relevant_cols[j])
-                    x[k, ind2, j] = tmp_[ind1]
+                ind1, ind2 = _sorted_intersect(date, t_vals)
+
+                block = ts_data[rc_list].to_numpy(dtype=float, copy=True)
+                block[:, is_prcp] = np.clip(block[:, is_prcp], 0.0, None)
+                block[:, is_et] = np.clip(-block[:, is_et], 0.0, None)
+                for j in modis_cols:
+                    block[:, j] = self._read_timeseries_1basin1var(
+                        ts_data, relevant_cols[j]
+                    )
+                return k, ind1, ind2, block
+
+            # basins are independent and reading them is I/O bound (local or MinIO),
+            # so load them concurrently and only fill x here
+            with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                if "s3://" in ts_dir:
+                    windows = self._submit_prefetched(
+                        executor, _load_basin, _ts_file, len(object_ids)
+                    )
+                else:
+                    windows = [
+                        [
+                            executor.submit(_load_basin, k)
+                            for k in range(len(object_ids))
+                        ]
+                    ]
+                # scatter each window as soon as its basins are loaded, the next
+                # window's files are fetched in the meantime
+                with tqdm(
+                    total=len(object_ids),
+                    desc=f"Reading timeseries data with {time_unit}",
+                ) as pbar:
+                    for futures in windows:
+                        for future in as_completed(futures):
+                            k, ind1, ind2, block = future.result()
+                            if len(ind2) < nt:
+                                x[k] = np.nan
+                            x[k, ind2, :] = block[ind1, :]
+                            pbar.update(1)
 
             results[time_unit] = x
 
         return results
 
+    def _submit_prefetched(self, executor, load_basin, ts_file, n_basins):
+        """Submit basin loaders fed by windowed fsspec ``cat`` calls on MinIO
+
+        The files of ``PREFETCH_WINDOW`` basins are fetched with one ``conf.FS.cat``
+        call, while the next window is being fetched in a background thread.
+
+        Parameters
+        ----------
+        executor : ThreadPoolExecutor
+            the pool running the basin loaders
+        load_basin : callable
+            ``load_basin(k, content)`` loads the k-th basin from its file bytes
+        ts_file : callable
+            ``ts_file(k)`` is the s3:// path of the k-th basin's csv file
+        n_basins : int
+            number of basins
+
+        Yields
+        ------
+        list of concurrent.futures.Future
+            the futures of one window, one per basin; the next window is already
+            being fetched when a window is yielded
+        """
+        windows = [
+            range(i, min(i + PREFETCH_WINDOW, n_basins))
+            for i in range(0, n_basins, PREFETCH_WINDOW)
+        ]
+
+        def _fetch(window):
+            return conf.FS.cat([ts_file(k) for k in window])
+
+        with ThreadPoolExecutor(max_workers=1) as prefetcher:
+            pending = prefetcher.submit(_fetch, windows[0]) if windows else None
+            for i, window in enumerate(windows):
+                contents = pending.result()
+                if i + 1 < len(windows):
+                    pending = prefetcher.submit(_fetch, windows[i + 1])
+                futures = []
+                for k in window:
+                    path = ts_file(k)
+                    content = contents.get(path, contents.get(strip_protocol(path)))
+                    futures.append(executor.submit(load_basin, k, content))
+                yield futures
+
+    def _read_ts_csv(self, ts_file, content=None, relevant_cols=None):
+        """Read one basin's timeseries csv file with the multithreaded pyarrow parser
+
+        Parameters
+        ----------
+        ts_file : str
+            local path or s3:// path of the csv file
+        content : bytes, optional
+            the already fetched bytes of ts_file, by default None
+        relevant_cols : list, optional
+            only parse the "time" column and these ones (as float32),
+            by default None (all columns)
+
+        Returns
+        -------
+        pd.DataFrame
+            the timeseries data of the basin
+        """
+        kwargs = {"engine": "pyarrow"}
+        if relevant_cols is not None:
+            kwargs["usecols"] = ["time", *relevant_cols]
+            kwargs["dtype"] = {col: np.float32 for col in relevant_cols}
+        if content is not None:
+            return pd.read_csv(io.BytesIO(content), **kwargs)
+        if "s3://" in ts_file:
+            with conf.FS.open(ts_file, mode="rb") as f:
+                return pd.read_csv(f, **kwargs)
+        return pd.read_csv(ts_file, **kwargs)
+
     def _read_timeseries_1basin1var(self, ts_data, relevant_col):
         if "precipitation" in relevant_col:
             prcp = ts_data[relevant_col].values
@@ -271,12 +479,12 @@ class SelfMadeHydroDataset(HydroData):
             object_ids = attrs["basin_id"].values
         if constant_cols is None:
             constant_cols = attrs.columns.values
-        x = np.full([len(object_ids), len(constant_cols)], np.nan)
-        for k in range(len(object_ids)):
-            ind = attrs["basin_id"] == object_ids[k]
-            for j in range(len(constant_cols)):
-                x[k, j] = attrs[constant_cols[j]][ind].values
-        return x
+        # one hash join on basin_id instead of a boolean mask per basin
+        return (
+            attrs.set_index("basin_id", drop=False)
+            .reindex(object_ids)[list(constant_cols)]
+            .to_numpy(dtype=float, na_value=np.nan)
+        )
 
     def get_attributes_cols(self) -> np.array:
         """the constant cols in this data_source"""
@@ -291,27 +499,39 @@ class SelfMadeHydroDataset(HydroData):
 
     def get_timeseries_cols(self) -> np.array:
         """the relevant cols in this data_source"""
-        ts_dirs = self.data_source_description["TS_DIRS"]
-        unit_files = self.data_source_description["UNIT_FILES"]
+        if self._timeseries_cols is not None:
+            return self._timeseries_cols
+        ts_dirs = self.data_source_description["TS_DIR_BY_UNIT"]
+        unit_files = self.data_source_description["UNIT_FILE_BY_UNIT"]
         all_vars = {}
         for time_unit in self.time_unit:
             # Find the directory that corresponds to the current time unit
-            ts_dir = next(dir_path for dir_path in ts_dirs if time_unit in dir_path)
+            ts_dir = ts_dirs[time_unit]
             # Find the corresponding unit file
-            unit_file = next(file for file in unit_files if time_unit in file)
+            unit_file = unit_files[time_unit]
             # Load the first CSV file in the directory to extract column names
             if "s3://" in ts_dir:
-                ts_file = os.path.join(ts_dir, minio_file_list(ts_dir)[0])
+                first = minio_file_list(ts_dir, limit=1)
+                if not first:
+                    raise FileNotFoundError(f"No timeseries file found in {ts_dir}")
+                ts_file = os.path.join(ts_dir, first[0])
                 with conf.FS.open(ts_file, mode="rb") as f:
                     ts_tmp = pd.read_csv(f, dtype={"basin_id": str})
             else:
-                ts_file = os.path.join(ts_dir, os.listdir(ts_dir)[0])
+                with os.scandir(ts_dir) as entries:
+                    first = next(
+                        (entry.name for entry in entries if entry.is_file()), None
+                    )
+                if first is None:
+                    raise FileNotFoundError(f"No timeseries file found in {ts_dir}")
+                ts_file = os.path.join(ts_dir, first)
                 ts_tmp = pd.read_csv(ts_file, dtype={"basin_id": str})
             # Get the relevant forcing units and validate against unit info
             forcing_units = ts_tmp.columns.values[1:]
             the_vars = self._check_vars_in_unitsinfo(forcing_units, unit_file)
             # Map the variables to the corresponding time unit
             all_vars[time_unit] = the_vars
+        self._timeseries_cols = all_vars
         return all_vars
 
     def _check_vars_in_unitsinfo(self, vars, unit_file=None):
@@ -331,11 +551,7 @@ class SelfMadeHydroDataset(HydroData):
             # For attributes, all the variables' units are same in all unit_info files
             # hence, we just chose the first one
             unit_file = self.data_source_description["UNIT_FILES"][0]
-        if "s3://" in unit_file:
-            with conf.FS.open(unit_file, mode="rb") as fp:
-                units_info = json.load(fp)
-        else:
-            units_info = hydro_file.unserialize_json(unit_file)
+        units_info = _read_units_info(unit_file)
         vars_final = [var_ for var_ in vars if var_ in units_info]
         return np.array(vars_final)
 
@@ -354,47 +570,27 @@ class SelfMadeHydroDataset(HydroData):
         # Mapping provided units to the variables in the datasets
         # For attributes, all the variables' units are same in all unit_info files
         # hence, we just chose the first one
-        if "s3://" in self.data_source_description["UNIT_FILES"][0]:
-            with conf.FS.open(
-                self.data_source_description["UNIT_FILES"][0], mode="rb"
-            ) as fp:
-                units_dict = json.load(fp)
-        else:
-            units_dict = hydro_file.unserialize_json(
-                self.data_source_description["UNIT_FILES"][0]
-            )
-
-        # Convert string columns to categorical variables and record categorical mappings
-        categorical_mappings = {}
-        for column in df_attr.columns:
-            if df_attr[column].dtype == "object":
-                df_attr[column] = df_attr[column].astype("category")
-                categorical_mappings[column] = dict(
-                    enumerate(df_attr[column].cat.categories)
-                )
-                df_attr[column] = df_attr[column].cat.codes
-
-        ds = xr.Dataset()
-        for column in df_attr.columns:
-            attrs = {"units": units_dict.get(column, "unknown")}
-            if column in categorical_mappings:
-                attrs["category_mapping"] = categorical_mappings[column]
-
-            data_array = xr.DataArray(
-                data=df_attr[column].values,
-                dims=["basin"],
-                # we have set gage_id as index so that it won't be saved as numeric values
-                coords={"basin": df_attr.index.values.astype(str)},
-                attrs=attrs,
-            )
-            ds[column] = data_array
-
-        # Convert categorical mappings to strings
+        units_dict = _read_units_info(self.data_source_description["UNIT_FILES"][0])
+
+        # Convert string columns to categorical codes and record categorical mappings
+        obj_cols = df_attr.select_dtypes("object").columns
+        cats = {column: df_attr[column].astype("category") for column in obj_cols}
+        categorical_mappings = {
+            column: dict(enumerate(cat.cat.categories)) for column, cat in cats.items()
+        }
+        for column, cat in cats.items():
+            df_attr[column] = cat.cat.codes
+
+        # we have set gage_id as index so that it won't be saved as numeric values
+        df_attr.index = pd.Index(df_attr.index.values.astype(str), name="basin")
+        ds = xr.Dataset.from_dataframe(df_attr)
         for column in ds.data_vars:
-            if "category_mapping" in ds[column].attrs:
-                # Convert the dictionary to a string
-                mapping_str = str(ds[column].attrs["category_mapping"])
-                ds[column].attrs["category_mapping"] = mapping_str
+            ds[column].attrs["units"] = units_dict.get(column, "unknown")
+            if column in categorical_mappings:
+                # netCDF attributes can't be dicts, so store the mapping as a string
+                ds[column].attrs["category_mapping"] = str(
+                    categorical_mappings[column]
+                )
         prefix_ = "" if region is None else region + "_"
         ds.to_netcdf(os.path.join(CACHE_DIR, f"{prefix_}attributes.nc"))
 
@@ -449,16 +645,8 @@ class SelfMadeHydroDataset(HydroData):
                     .tolist()
                 )
             # Retrieve the correct units information for this time unit
-            unit_file = next(
-                file
-                for file in self.data_source_description["UNIT_FILES"]
-                if time_unit in file
-            )
-            if "s3://" in unit_file:
-                with conf.FS.open(unit_file, mode="rb") as fp:
-                    units_info = json.load(fp)
-            else:
-                units_info = hydro_file.unserialize_json(unit_file)
+            unit_file = self.data_source_description["UNIT_FILE_BY_UNIT"][time_unit]
+            units_info = _read_units_info(unit_file)
 
             for basin_batch in data_generator(basins, batchsize):
                 data = self.read_timeseries(
@@ -473,20 +661,17 @@ class SelfMadeHydroDataset(HydroData):
                     start0101_freq=start0101_freq,
                 )
 
-                dataset = xr.Dataset(
-                    data_vars={
-                        variables[time_unit][i]: (
-                            ["basin", "time"],
-                            data[time_unit][:, :, i],
-                            {"units": units_info[variables[time_unit][i]]},
-                        )
-                        for i in range(len(variables[time_unit]))
-                    },
+                dataset = xr.DataArray(
+                    data[time_unit],
+                    dims=("basin", "time", "variable"),
                     coords={
                         "basin": basin_batch,
                         "time": pd.to_datetime(times),
+                        "variable": variables[time_unit],
                     },
-                )
+                ).to_dataset(dim="variable")
+                for var in dataset.data_vars:
+                    dataset[var].attrs["units"] = units_info[var]
 
                 # Save the dataset to a NetCDF file for the current batch and time unit
                 prefix_ = "" if region is None else region + "_"
@@ -494,7 +679,17 @@ class SelfMadeHydroDataset(HydroData):
                     CACHE_DIR,
                     f"{prefix_}timeseries_{time_unit}_batch_{basin_batch[0]}_{basin_batch[-1]}.nc",
                 )
-                dataset.to_netcdf(batch_file_path)
+                # float32 with compression and basin-batch x time chunks for the cache
+                encoding = {
+                    var: {
+                        "zlib": True,
+                        "complevel": 3,
+                        "chunksizes": (len(basin_batch), min(len(times), 4096)),
+                        "dtype": "float32",
+                    }
+                    for var in variables[time_unit]
+                }
+                dataset.to_netcdf(batch_file_path, encoding=encoding, engine="h5netcdf")
 
                 # Release memory by deleting the dataset
                 del dataset
@@ -540,51 +735,44 @@ class SelfMadeHydroDataset(HydroData):
 
         for time_unit in time_units:
             # Collect batch files specific to the current time unit
-            batch_files = [
-                os.path.join(CACHE_DIR, f)
-                for f in os.listdir(CACHE_DIR)
-                if re.match(
-                    rf"^{prefix_}timeseries_{time_unit}_batch_[A-Za-z0-9_]+_[A-Za-z0-9_]+\.nc$",
-                    f,
-                )
-            ]
+            pattern = re.compile(
+                rf"^{re.escape(prefix_)}timeseries_{time_unit}_batch_[A-Za-z0-9_]+_[A-Za-z0-9_]+\.nc$"
+            )
+            batch_files = _list_batch_files(pattern)
 
             if not batch_files:
                 # Cache the data if no batch files are found for the current time unit
                 self.cache_timeseries_xrdataset(region=region, **kwargs)
-                batch_files = [
-                    os.path.join(CACHE_DIR, f)
-                    for f in os.listdir(CACHE_DIR)
-                    if re.match(
-                        rf"^{prefix_}timeseries_{time_unit}_batch_[A-Za-z0-9_]+_[A-Za-z0-9_]+\.nc$",
-                        f,
-                    )
-                ]
-
-            selected_datasets = []
-
-            for batch_file in batch_files:
-                ds = xr.open_dataset(batch_file)
+                batch_files = _list_batch_files(pattern)
+
+            # open all batches as one lazily-concatenated dataset and select on it
+            ds = xr.open_mfdataset(
+                sorted(batch_files),
+                combine="nested",
+                concat_dim="basin",
+                parallel=True,
+                engine="h5netcdf",
+                chunks={"basin": 256},
+                # batches share the time coordinate, so skip aligning them
+                join="override",
+                compat="override",
+                coords="minimal",
+                data_vars="minimal",
+            )
+            if any(var not in ds.variables for var in var_lst):
                 all_vars = ds.data_vars
-                if any(var not in ds.variables for var in var_lst):
-                    raise ValueError(f"var_lst must all be in {all_vars}")
-                if valid_gage_ids := [
-                    gid for gid in gage_id_lst if gid in ds["basin"].values
-                ]:
-                    ds_selected = ds[var_lst].sel(
-                        basin=valid_gage_ids, time=slice(t_range[0], t_range[1])
-                    )
-                    selected_datasets.append(ds_selected)
-
-                ds.close()  # Close the dataset to free memory
-
-            # If any datasets were selected, concatenate them along the 'basin' dimension
-            if selected_datasets:
-                datasets_by_time_unit[time_unit] = xr.concat(
-                    selected_datasets, dim="basin"
+                ds.close()
+                raise ValueError(f"var_lst must all be in {all_vars}")
+            cached_ids = set(ds["basin"].values)
+            if valid_gage_ids := [gid for gid in gage_id_lst if gid in cached_ids]:
+                datasets_by_time_unit[time_unit] = (
+                    ds[var_lst]
+                    .sel(basin=valid_gage_ids, time=slice(t_range[0], t_range[1]))
+                    .load()
                 )
             else:
                 datasets_by_time_unit[time_unit] = xr.Dataset()
+            ds.close()  # Close the dataset to free memory
 
         return datasets_by_time_unit
 
@@ -15,7 +15,7 @@ import json
 from ..configs.config import FS, MINIO_PARAM
 
 from ..configs.config import RO
-from ..utils.utils import regen_box
+from ..utils.utils import cf2datetime, regen_box
 
 bucket_name = MINIO_PARAM["bucket_name"]
 
@@ -250,28 +250,6 @@ def get_dataset_day(start_time, end_time, bbox, time_chunks):
     return ds
 
 
-def cf2datetime(ds):
-    ds = ds.copy()
-    time_tmp1 = ds.indexes["time"]
-    attrs = ds.coords["time"].attrs
-    time_tmp2 = []
-    for i in range(time_tmp1.shape[0]):
-        tmp = time_tmp1[i]
-        a = str(tmp.year).zfill(4)
-        b = str(tmp.month).zfill(2)
-        c = str(tmp.day).zfill(2)
-        d = str(tmp.hour).zfill(2)
-        e = str(tmp.minute).zfill(2)
-        f = str(tmp.second).zfill(2)
-        time_tmp2.append(
-            np.datetime64("{}-{}-{} {}:{}:{}.00000000".format(a, b, c, d, e, f))
-        )
-    ds = ds.assign_coords(time=time_tmp2)
-    ds.coords["time"].attrs = attrs
-
-    return ds
-
-
 def open_dataset(
     start_time=np.datetime64("2023-01-01T00:00:00.000000000"),
     end_time=np.datetime64("2023-01-02T00:00:00.000000000"),
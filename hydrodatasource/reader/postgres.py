@@ -1,8 +1,27 @@
 from hydrodatasource.configs.config import SETTING
 from datetime import datetime, timedelta
 import pandas as pd
+from functools import lru_cache
 from loguru import logger
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+
+
+@lru_cache(maxsize=None)
+def _get_engine(db_username, db_password, db_host, db_port, db_name):
+    # 同一组连接参数只建一次engine，复用其连接池
+    return create_engine(
+        f"postgresql+psycopg2://{db_username}:{db_password}@{db_host}:{db_port}/{db_name}"
+    )
+
+
+def _postgres_engine():
+    return _get_engine(
+        SETTING["postgres"]["username"],
+        SETTING["postgres"]["password"],
+        SETTING["postgres"]["server_url"],
+        SETTING["postgres"]["port"],
+        SETTING["postgres"]["database"],
+    )
 
 
 def read_forcing_dataframe(var_type, basin, time_period):
@@ -18,13 +37,6 @@ def read_forcing_dataframe(var_type, basin, time_period):
         "gfs_soilw": "t_gfs_soil_pre_data",
     }
 
-    column_dataname = {
-        "gpm_tp": "tp",
-        "smap_sm_surface": "sm_surface",
-        "gfs_tp": "tp",
-        "gfs_soilw": "sm_surface",
-    }
-
     if var_type in ["gpm_tp", "smap_sm_surface"]:
         datetime_column = "predictdate"
     elif var_type in ["gfs_tp", "gfs_soilw"]:
@@ -47,9 +59,9 @@ def read_forcing_dataframe(var_type, basin, time_period):
         SELECT 
             basincode, 
             predictdate, 
-            data ->> 'tp' AS tp,
-            data ->> 'raster_area' AS raster_area,
-            data ->> 'intersection_area' AS intersection_area
+            (data ->> 'tp')::float8 AS tp,
+            (data ->> 'raster_area')::float8 AS raster_area,
+            (data ->> 'intersection_area')::float8 AS intersection_area
         FROM (
             SELECT 
                 basincode, 
@@ -57,19 +69,19 @@ def read_forcing_dataframe(var_type, basin, time_period):
                 jsonb_array_elements(data) AS data
             FROM {table_name[var_type]}
         ) {table_name[var_type]}
-        WHERE predictdate >= '{start_time}' 
+        WHERE predictdate >= :start_time
         """
         if end_time is not None:
-            sql += f" AND predictdate <= '{end_time}'"
-        sql += f" AND basincode = '{basin}'"
+            sql += " AND predictdate <= :end_time"
+        sql += " AND basincode = :basin ORDER BY predictdate"
     elif var_type == "smap_sm_surface":
         sql = f"""
         SELECT 
             basincode, 
             predictdate, 
-            data ->> 'sm_surface' AS sm_surface,
-            data ->> 'raster_area' AS raster_area,
-            data ->> 'intersection_area' AS intersection_area
+            (data ->> 'sm_surface')::float8 AS sm_surface,
+            (data ->> 'raster_area')::float8 AS raster_area,
+            (data ->> 'intersection_area')::float8 AS intersection_area
         FROM (
             SELECT 
                 basincode, 
@@ -77,58 +89,48 @@ def read_forcing_dataframe(var_type, basin, time_period):
                 jsonb_array_elements(data) AS data
             FROM {table_name[var_type]}
         ) {table_name[var_type]}
-        WHERE predictdate >= '{start_time}' 
+        WHERE predictdate >= :start_time
         """
         if end_time is not None:
-            sql += f" AND predictdate <= '{end_time}'"
-        sql += f" AND basincode = '{basin}'"
+            sql += " AND predictdate <= :end_time"
+        sql += " AND basincode = :basin ORDER BY predictdate"
     elif var_type == "gfs_tp":
         sql = f"""
         select
             basin_code,
             forecastdatetime,
-            tp AS tp,
-            raster_area,
-            intersection_area 
+            tp::float8 AS tp,
+            raster_area::float8 AS raster_area,
+            intersection_area::float8 AS intersection_area
         from {table_name[var_type]}
-        WHERE forecastdatetime >= '{start_time}' 
+        WHERE forecastdatetime >= :start_time
         """
         if end_time is not None:
-            sql += f" AND forecastdatetime <= '{end_time}'"
-        sql += f" AND basin_code = '{basin}'"
+            sql += " AND forecastdatetime <= :end_time"
+        sql += " AND basin_code = :basin ORDER BY forecastdatetime"
     elif var_type == "gfs_soilw":
         sql = f"""
         select
             basin_code,
             forecastdatetime,
-            soilw AS sm_surface,
-            raster_area,
-            intersection_area 
+            soilw::float8 AS sm_surface,
+            raster_area::float8 AS raster_area,
+            intersection_area::float8 AS intersection_area
         from {table_name[var_type]}
-        WHERE forecastdatetime >= '{start_time}' 
+        WHERE forecastdatetime >= :start_time
         """
         if end_time is not None:
-            sql += f" AND forecastdatetime <= '{end_time}'"
-        sql += f" AND basin_code = '{basin}'"
+            sql += " AND forecastdatetime <= :end_time"
+        sql += " AND basin_code = :basin ORDER BY forecastdatetime"
 
-    db_username = SETTING["postgres"]["username"]
-    db_password = SETTING["postgres"]["password"]
-    db_host = SETTING["postgres"]["server_url"]
-    db_port = SETTING["postgres"]["port"]
-    db_name = SETTING["postgres"]["database"]
-    engine = create_engine(
-        f"postgresql+psycopg2://{db_username}:{db_password}@{db_host}:{db_port}/{db_name}"
-    )
+    engine = _postgres_engine()
+    params = {"start_time": start_time, "basin": basin}
+    if end_time is not None:
+        params["end_time"] = end_time
     # 执行查询数据SQL查询
     try:
-        df = pd.read_sql(sql, engine)
-        # 转换数据类型
-        df[column_dataname[var_type]] = df[column_dataname[var_type]].astype(float)
-        df["raster_area"] = df["raster_area"].astype(float)
-        df["intersection_area"] = df["intersection_area"].astype(float)
-        # 按照时间列排序
-        df = df.sort_values(by=datetime_column)
-        
+        # 数据类型转换和按时间排序都已在SQL中完成
+        df = pd.read_sql(text(sql), engine, params=params)
         df[datetime_column] = pd.to_datetime(df[datetime_column]) + timedelta(hours=8)
     except Exception as e:
         logger.error(e)
@@ -146,17 +148,9 @@ def read_plcd(basin):
     WHERE
         stcd = %s
     """
-    
-    db_username = SETTING["postgres"]["username"]
-    db_password = SETTING["postgres"]["password"]
-    db_host = SETTING["postgres"]["server_url"]
-    db_port = SETTING["postgres"]["port"]
-    db_name = SETTING["postgres"]["database"]
-    
-    engine = create_engine(
-        f"postgresql+psycopg2://{db_username}:{db_password}@{db_host}:{db_port}/{db_name}"
-    )
-    
+
+    engine = _postgres_engine()
+
     result = pd.read_sql(sql, engine, params=(basin,))
     
     if result.empty:
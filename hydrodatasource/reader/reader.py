@@ -93,6 +93,8 @@ class CommonHandler(AOI):
             return xr.open_dataset(
                 "reference://",
                 engine="zarr",
+                # keep the referenced chunking so later selections stay lazy
+                chunks={},
                 backend_kwargs={
                     "consolidated": False,
                     "storage_options": {
@@ -1,4 +1,6 @@
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import geopandas as gpd
 import h5py
@@ -6,31 +8,149 @@ import numpy as np
 import pandas as pd
 import xarray as xr
 from pandas import DataFrame
-from pandas.core.indexes.api import default_index
 import hydrodatasource.processor.mask as hpm
 import hydrodatasource.configs.config as hdscc
 from hydrodatasource.processor.basin_mean_rainfall import rainfall_average
 from hydrodatasource.reader import access_fs
 
 
-def query_path_from_metadata(
-    basin_id, time_start=None, time_end=None, bbox=None, data_source="gpm"
-):
-    # query path from other columns from metadata.csv
-    metadata_df = pd.read_csv(
-        f"s3://grids-origin/{data_source}_metadata.csv",
-        storage_options=hdscc.MINIO_PARAM,
-    )
-    source_list = [
-        x
-        for x in metadata_df["path"]
-        if ((data_source in x) | (data_source.upper() in x))
-    ]
-    paths = metadata_df[metadata_df["path"].isin(source_list)]
+# 并发生成tile的线程数
+TILE_WORKERS = 16
+# 从MinIO读取HDF5/netCDF4文件时fsspec块缓存的块大小
+HDF5_BLOCK_SIZE = 4 * 1024 * 1024
+
+# 进程内缓存的metadata: data_source -> (ETag, DataFrame)
+_METADATA_CACHE = {}
+# 还没写回MinIO的新tile记录: data_source -> list of dict
+_PENDING_TILES = {}
+# metadata中bbox列解析出的(N, 4)数组，行与缓存的DataFrame一一对应
+_BBOX_CACHE = {}
+# metadata中解析好的时间列: data_source -> (time_start按升序排列, 排序的行号, time_end)
+_TIME_CACHE = {}
+# 以上缓存的读写都在这把锁内进行，多线程调用时保持一致
+_METADATA_LOCK = threading.RLock()
+
+
+def _metadata_path(data_source):
+    return f"s3://grids-origin/{data_source}_metadata.csv"
+
+
+def _metadata_etag(path):
+    # 只发一次HEAD请求，不用s3fs的目录缓存
+    hdscc.FS.invalidate_cache(path)
+    return hdscc.FS.info(path).get("ETag")
+
+
+def _get_metadata(data_source):
+    """读取data_source的metadata，MinIO上的文件未变化(ETag相同)时直接用缓存"""
+    path = _metadata_path(data_source)
+    with _METADATA_LOCK:
+        etag = _metadata_etag(path)
+        cached = _METADATA_CACHE.get(data_source)
+        if cached is not None and etag is not None and cached[0] == etag:
+            return cached[1]
+        metadata_df = pd.read_csv(path, storage_options=hdscc.MINIO_PARAM)
+        if _PENDING_TILES.get(data_source):
+            # 别处更新了metadata，把本进程还没写回的记录接上
+            metadata_df = pd.concat(
+                [metadata_df, pd.DataFrame(_PENDING_TILES[data_source])],
+                ignore_index=True,
+            )
+        _METADATA_CACHE[data_source] = (etag, metadata_df)
+        _BBOX_CACHE[data_source] = _parse_bbox(metadata_df["bbox"])
+        _TIME_CACHE[data_source] = _parse_times(metadata_df)
+        return metadata_df
+
+
+def _parse_times(metadata_df):
+    """解析time_start/time_end列，并按time_start排好序以便二分查找"""
+    time_start = pd.to_datetime(metadata_df["time_start"], errors="coerce").to_numpy()
+    time_end = pd.to_datetime(metadata_df["time_end"], errors="coerce").to_numpy()
+    order = np.argsort(time_start, kind="stable")
+    return time_start[order], order, time_end
+
+
+def _rows_in_time(data_source, time_start, time_end):
+    """time_start之后开始、time_end之前结束的行号(按原顺序)"""
+    start_sorted, order, end = _TIME_CACHE[data_source]
+    rows = order
     if time_start is not None:
-        paths = paths[paths["time_start"] >= time_start]
+        # time_start无法解析的行只在按开始时间筛选时排除
+        i0 = np.searchsorted(start_sorted, np.datetime64(pd.Timestamp(time_start)))
+        rows = order[i0:][~np.isnat(start_sorted[i0:])]
     if time_end is not None:
-        paths = paths[paths["time_end"] <= time_end]
+        rows = rows[end[rows] <= np.datetime64(pd.Timestamp(time_end))]
+    return np.sort(rows)
+
+
+def _parse_bbox(bbox_series):
+    """把"[w, e, n, s]"形式的bbox字符串列一次性解析为(N, 4)的浮点数组"""
+    if len(bbox_series) == 0:
+        return np.empty((0, 4))
+    return (
+        bbox_series.str.strip("[]")
+        .str.split(",", expand=True)
+        .reindex(columns=range(4))
+        .astype(float)
+        .to_numpy()
+    )
+
+
+def _bbox_covers(data_source, paths, bbox):
+    """paths中每行的bbox是否覆盖给定的bbox"""
+    bb = _BBOX_CACHE[data_source][paths.index.to_numpy()]
+    return (
+        (bb[:, 0] <= bbox[0])
+        & (bb[:, 1] >= bbox[1])
+        & (bb[:, 2] >= bbox[2])
+        & (bb[:, 3] <= bbox[3])
+    )
+
+
+def append_tiles(data_source, new_rows):
+    """把新生成的tile记录加入缓存的metadata，由flush_metadata写回MinIO"""
+    with _METADATA_LOCK:
+        metadata_df = _get_metadata(data_source)
+        if not new_rows:
+            return metadata_df
+        etag = _METADATA_CACHE[data_source][0]
+        metadata_df = pd.concat(
+            [metadata_df, pd.DataFrame(new_rows)], ignore_index=True
+        )
+        _METADATA_CACHE[data_source] = (etag, metadata_df)
+        new_bbox = _parse_bbox(pd.Series([row["bbox"] for row in new_rows]))
+        _BBOX_CACHE[data_source] = np.vstack([_BBOX_CACHE[data_source], new_bbox])
+        _TIME_CACHE[data_source] = _parse_times(metadata_df)
+        _PENDING_TILES.setdefault(data_source, []).extend(new_rows)
+        return metadata_df
+
+
+def flush_metadata(data_source=None):
+    """把缓存中新增了tile的metadata写回MinIO，data_source为None时写回全部"""
+    with _METADATA_LOCK:
+        data_sources = (
+            list(_PENDING_TILES) if data_source is None else [data_source]
+        )
+        for source in data_sources:
+            if not _PENDING_TILES.get(source):
+                continue
+            path = _metadata_path(source)
+            metadata_df = _METADATA_CACHE[source][1]
+            hdscc.FS.pipe_file(path, metadata_df.to_csv(index=False).encode())
+            _PENDING_TILES[source] = []
+            _METADATA_CACHE[source] = (_metadata_etag(path), metadata_df)
+
+
+def _filter_metadata(metadata_df, basin_id, time_start, time_end, bbox, data_source):
+    """按时间、数据源、bbox筛选metadata，返回候选源文件和已有的tile，需在锁内调用"""
+    if time_start is not None or time_end is not None:
+        metadata_df = metadata_df.iloc[
+            _rows_in_time(data_source, time_start, time_end)
+        ]
+    paths = metadata_df[
+        metadata_df["path"].str.contains(data_source, regex=False)
+        | metadata_df["path"].str.contains(data_source.upper(), regex=False)
+    ]
     if (
         (data_source == "gpm")
         or (data_source == "smap")
@@ -38,140 +158,162 @@ def query_path_from_metadata(
         or (data_source == "era5")
     ):
         if bbox is not None:
-            paths = paths[
-                (paths["bbox"].apply(lambda x: string_to_list(x)[0] <= bbox[0]))
-                & (paths["bbox"].apply(lambda x: string_to_list(x)[1] >= bbox[1]))
-                & (paths["bbox"].apply(lambda x: string_to_list(x)[2] >= bbox[2]))
-                & (paths["bbox"].apply(lambda x: string_to_list(x)[3] <= bbox[3]))
-            ]
+            paths = paths[_bbox_covers(data_source, paths, bbox)]
     elif data_source == "gfs":
-        path_list_predicate = paths[
-            paths["path"].isin(choose_gfs(paths, time_start, time_end))
-        ]
-        paths = paths[
-            path_list_predicate["bbox"].apply(lambda x: string_to_list(x)[0] <= bbox[0])
-            & (paths["bbox"].apply(lambda x: string_to_list(x)[1] >= bbox[1]))
-            & (paths["bbox"].apply(lambda x: string_to_list(x)[2] >= bbox[2]))
-            & (paths["bbox"].apply(lambda x: string_to_list(x)[3] <= bbox[3]))
-        ]
+        in_time = paths["path"].isin(choose_gfs(paths, time_start, time_end))
+        paths = paths[in_time.to_numpy() & _bbox_covers(data_source, paths, bbox)]
     candidate_tile_list = paths[
-        paths["path"].apply(lambda x: ("_tile" in x) & (basin_id in x))
+        paths["path"].str.contains("_tile", regex=False)
+        & paths["path"].str.contains(basin_id, regex=False)
     ]
+    return paths, candidate_tile_list
+
+
+def query_path_from_metadata(
+    basin_id,
+    time_start=None,
+    time_end=None,
+    bbox=None,
+    data_source="gpm",
+    flush=True,
+):
+    # query path from other columns from metadata.csv
+    # flush为True时新tile记录立即写回metadata；批量查询可设为False，最后统一flush_metadata
+    with _METADATA_LOCK:
+        metadata_df = _get_metadata(data_source)
+        paths, candidate_tile_list = _filter_metadata(
+            metadata_df, basin_id, time_start, time_end, bbox, data_source
+        )
     if len(candidate_tile_list) == 0:
         tile_list = generate_metadata(
-            paths, data_source, bbox, time_start, time_end, basin_id
+            paths, data_source, bbox, time_start, time_end, basin_id, flush=flush
         )[0]
     else:
         tile_list = candidate_tile_list["path"][
-            candidate_tile_list["bbox"].apply(lambda x: str(bbox) == x)
+            candidate_tile_list["bbox"] == str(bbox)
         ].to_list()
         should_length = standard_length(data_source, time_start, time_end)
         if len(tile_list) < should_length - 2:
             tile_list = generate_metadata(
-                paths, data_source, bbox, time_start, time_end, basin_id
+                paths,
+                data_source,
+                bbox,
+                time_start,
+                time_end,
+                basin_id,
+                flush=flush,
             )[0]
     return tile_list
 
 
 def generate_metadata(
-    paths: DataFrame, data_source: str, bbox: list, time_start, time_end, basin_id
+    paths: DataFrame,
+    data_source: str,
+    bbox: list,
+    time_start,
+    time_end,
+    basin_id,
+    flush=True,
 ):
-    metadata_df = pd.read_csv(
-        f"s3://grids-origin/{data_source}_metadata.csv",
-        storage_options=hdscc.MINIO_PARAM,
-    )
     tile_list = generate_tile_list(
         paths, data_source, bbox, time_start, time_end, basin_id
     )
-    bbox_array = np.repeat(str(bbox), len(tile_list))
-    time_start_array = np.repeat(str(time_start), len(tile_list))
-    time_end_array = np.repeat(str(time_end), len(tile_list))
-    if data_source != "smap":
-        res_array = np.repeat(hpm.get_para(data_source)[0], len(tile_list))
-        temp_df = pd.DataFrame(
-            {
-                "bbox": bbox_array,
-                "time_start": time_start_array,
-                "time_end": time_end_array,
-                "res_lon": res_array,
-                "res_lat": res_array,
-                "path": tile_list,
-            },
-            index=default_index(len(tile_list)),
-        )
-    else:
-        temp_df = pd.DataFrame(
-            {
-                "bbox": bbox_array,
-                "time_start": time_start_array,
-                "time_end": time_end_array,
-                "res_lon": np.repeat(0.08, len(tile_list)),
-                "res_lat": np.repeat(0.08, len(tile_list)),
-                "path": tile_list,
-            },
-            index=default_index(len(tile_list)),
-        )
-    metadata_df = pd.concat([metadata_df, temp_df], axis=0)
-    metadata_df.to_csv(f"{data_source}_metadata.csv", index=False)
-    hdscc.FS.put_file(
-        f"{data_source}_metadata.csv", f"s3://grids-origin/{data_source}_metadata.csv"
-    )
-    os.remove(f"{data_source}_metadata.csv")
+    res = 0.08 if data_source == "smap" else hpm.get_para(data_source)[0]
+    new_rows = [
+        {
+            "bbox": str(bbox),
+            "time_start": str(time_start),
+            "time_end": str(time_end),
+            "res_lon": res,
+            "res_lat": res,
+            "path": tile_path,
+        }
+        for tile_path in tile_list
+    ]
+    metadata_df = append_tiles(data_source, new_rows)
+    if flush:
+        flush_metadata(data_source)
     return tile_list, metadata_df
 
 
 def generate_tile_list(
     paths: DataFrame, data_source, bbox, time_start, time_end, basin_id
 ):
-    tile_list = []
-    for path in paths["path"]:
-        tile_path = path.rstrip(".nc4") + f"{basin_id}_tile.nc4"
-        if data_source == "smap":
-            path_ds = h5py.File(hdscc.FS.open(path))
-            # datetime.fromisoformat('2000-01-01T12:00:00') + timedelta(seconds=path_ds['time'][0])
-            lon_array = path_ds["cell_lon"][0]
-            lat_array = path_ds["cell_lat"][:, 0]
-            cell_lon_w = np.argwhere(lon_array >= bbox[0])[0][0]
-            cell_lon_e = np.argwhere(lon_array <= bbox[1])[-1][0]
-            cell_lat_n = np.argwhere(lat_array <= bbox[2])[0][0]
-            cell_lat_s = np.argwhere(lat_array >= bbox[3])[-1][0]
-            tile_da = path_ds["Geophysical_Data"]["sm_surface"][
-                cell_lat_n : cell_lat_s + 1, cell_lon_w : cell_lon_e + 1
-            ]
-            tile_ds = xr.DataArray(tile_da).to_dataset(name="sm_surface")
-        elif (data_source == "era5_land") | (data_source == "era5"):
-            path_ds = access_fs.spec_path(path.lstrip("s3://"), head="minio")
+    # 每个tile都是独立的读取+上传，受网络延迟限制，用线程并发执行
+    with ThreadPoolExecutor(max_workers=TILE_WORKERS) as executor:
+        return list(
+            executor.map(
+                lambda path: _make_tile(
+                    path, data_source, bbox, time_start, time_end, basin_id
+                ),
+                paths["path"],
+            )
+        )
+
+
+def _open_hdf5(path):
+    """打开MinIO上的HDF5/netCDF4文件
+
+    HDF5会发出大量小的read，用块缓存把它们合并成少量4MB的范围请求
+    """
+    return hdscc.FS.open(
+        path, mode="rb", cache_type="blockcache", block_size=HDF5_BLOCK_SIZE
+    )
+
+
+def _make_tile(path, data_source, bbox, time_start, time_end, basin_id):
+    """从path对应的数据中裁出bbox范围的tile并上传，返回tile的路径"""
+    tile_path = path.rstrip(".nc4") + f"{basin_id}_tile.nc4"
+    if data_source == "smap":
+        path_ds = h5py.File(_open_hdf5(path))
+        # datetime.fromisoformat('2000-01-01T12:00:00') + timedelta(seconds=path_ds['time'][0])
+        lon_array = np.ascontiguousarray(path_ds["cell_lon"][0, :])
+        # 纬度自北向南递减，取负后升序以便二分查找
+        neg_lat_array = -np.ascontiguousarray(path_ds["cell_lat"][:, 0])
+        cell_lon_w = np.searchsorted(lon_array, bbox[0], side="left")
+        cell_lon_e = np.searchsorted(lon_array, bbox[1], side="right") - 1
+        cell_lat_n = np.searchsorted(neg_lat_array, -bbox[2], side="left")
+        cell_lat_s = np.searchsorted(neg_lat_array, -bbox[3], side="right") - 1
+        # 直接把hyperslab读进预先分配好的数组，跳过h5py高层__getitem__的开销
+        sm_surface = path_ds["Geophysical_Data"]["sm_surface"]
+        tile_da = np.empty(
+            (cell_lat_s + 1 - cell_lat_n, cell_lon_e + 1 - cell_lon_w),
+            dtype=sm_surface.dtype,
+        )
+        sm_surface.read_direct(
+            tile_da,
+            source_sel=np.s_[cell_lat_n : cell_lat_s + 1, cell_lon_w : cell_lon_e + 1],
+        )
+        tile_ds = xr.DataArray(tile_da).to_dataset(name="sm_surface")
+    elif (data_source == "era5_land") | (data_source == "era5"):
+        path_ds = access_fs.spec_path(path.lstrip("s3://"), head="minio")
+        tile_ds = path_ds.sel(
+            time=slice(time_start, time_end),
+            longitude=slice(bbox[0], bbox[1]),
+            latitude=slice(bbox[2], bbox[3]),
+        )
+    else:
+        # 会扰乱桶，注意
+        path_ds = xr.open_dataset(_open_hdf5(path), chunks={})
+        if data_source == "gpm":
+            tile_ds = path_ds.sel(
+                time=slice(time_start, time_end),
+                lon=slice(bbox[0], bbox[1]),
+                lat=slice(bbox[3], bbox[2]),
+            )
+        # 会扰乱桶，注意
+        elif data_source == "gfs":
             tile_ds = path_ds.sel(
                 time=slice(time_start, time_end),
                 longitude=slice(bbox[0], bbox[1]),
                 latitude=slice(bbox[2], bbox[3]),
             )
         else:
-            # 会扰乱桶，注意
-            path_ds = xr.open_dataset(hdscc.FS.open(path))
-            if data_source == "gpm":
-                tile_ds = path_ds.sel(
-                    time=slice(time_start, time_end),
-                    lon=slice(bbox[0], bbox[1]),
-                    lat=slice(bbox[3], bbox[2]),
-                )
-            # 会扰乱桶，注意
-            elif data_source == "gfs":
-                tile_ds = path_ds.sel(
-                    time=slice(time_start, time_end),
-                    longitude=slice(bbox[0], bbox[1]),
-                    latitude=slice(bbox[2], bbox[3]),
-                )
-            else:
-                tile_ds = path_ds
-        if data_source in ["gpm", "smap", "era5_land", "era5"]:
-            hdscc.FS.write_bytes(tile_path, tile_ds.to_netcdf())
-        elif data_source == "gfs":
-            tile_ds.to_netcdf("temp.nc4")
-            hdscc.FS.put_file("temp.nc4", tile_path)
-            os.remove("temp.nc4")
-        tile_list.append(tile_path)
-    return tile_list
+            tile_ds = path_ds
+    if data_source in ["gpm", "smap", "era5_land", "era5", "gfs"]:
+        # 在内存中序列化后直接上传，不经过本地临时文件
+        hdscc.FS.pipe_file(tile_path, bytes(tile_ds.to_netcdf(engine="h5netcdf")))
+    return tile_path
 
 
 def standard_length(data_source, time_start, time_end):
@@ -197,28 +339,19 @@ def choose_gfs(paths, start_time, end_time):
     Returns:
         list: A list of GFS data within the specified time range and bounding box.
     """
-    path_list = []
     produce_times = ["00", "06", "12", "18"]
     if start_time is None:
         start_time = paths["time_start"].iloc[0]
     if end_time is None:
         end_time = paths["time_end"].iloc[-1]
-    time_range = pd.date_range(start_time, end_time, freq="1D")
-    for date in time_range:
-        date_str = date.strftime("%Y/%m/%d")
-        for i in range(len(produce_times)):
-            for j in range(6 * i, 6 * (i + 1)):
-                path = (
-                    "s3://grids-origin/GFS/GEE/1h/"
-                    + date_str
-                    + "/"
-                    + produce_times[i]
-                    + "/gfs20220103.t"
-                    + produce_times[i]
-                    + "z.nc4.0p25.f"
-                    + "{:03d}".format(j)
-                )
-                path_list.append(path)
+    date_strs = pd.date_range(start_time, end_time, freq="1D").strftime("%Y/%m/%d")
+    # 每个起报时次对应6个预报时效: 00->f000~f005, 06->f006~f011, ...
+    path_list = [
+        f"s3://grids-origin/GFS/GEE/1h/{date_str}/{produce_times[j // 6]}"
+        f"/gfs20220103.t{produce_times[j // 6]}z.nc4.0p25.f{j:03d}"
+        for date_str in date_strs
+        for j in range(6 * len(produce_times))
+    ]
     return path_list
 
 
@@ -226,8 +359,12 @@ def string_to_list(x: str):
     return list(map(float, x[1:-1].split(",")))
 
 
-def generate_bbox_from_shp(basin_shape_path, data_source, minio=True):
+def generate_bbox_from_shp(
+    basin_shape_path, data_source, minio=True, return_mask=False
+):
     # 只考虑单个流域
+    # return_mask为True时同时返回计算bbox时生成的mask(smap不生成mask，返回None)
+    mask = None
     if minio:
         basin_gpd = access_fs.spec_path(basin_shape_path.lstrip("s3://"), head="minio")
     else:
@@ -246,6 +383,8 @@ def generate_bbox_from_shp(basin_shape_path, data_source, minio=True):
             mask["lat"].values.max(),
             mask["lat"].values.min(),
         ]
+    if return_mask:
+        return bbox, basin_gpd, mask
     return bbox, basin_gpd
 
 
@@ -253,7 +392,9 @@ def grid_mean_mask(basin_id, times: list, data_source):
     # basin_id: basin_CHN_songliao_21401550, 碧流河
     # times: [[2023-06-06 00:00:00, 2023-06-06 02:00:00], [2023-06-07 00:00:00, 2023-06-07 02:00:00]]
     basin_shp = f"s3://basins-origin/basin_shapefiles/{basin_id}.zip"
-    bbox, basin = generate_bbox_from_shp(basin_shp, data_source=data_source)
+    bbox, basin, mask = generate_bbox_from_shp(
+        basin_shp, data_source=data_source, return_mask=True
+    )
     aver_npy = f"{basin_id}_{times}_{data_source}_hour_array.npy"
     s3_aver_npy_path = f"s3://basins-origin/hour_data/1h/mean_data/{aver_npy}"
     if hdscc.FS.exists(s3_aver_npy_path):
@@ -264,14 +405,24 @@ def grid_mean_mask(basin_id, times: list, data_source):
             time_start = time_slice[0]
             time_end = time_slice[1]
             aoi_path = query_path_from_metadata(
-                basin_id, time_start, time_end, bbox, data_source=data_source
+                basin_id,
+                time_start,
+                time_end,
+                bbox,
+                data_source=data_source,
+                flush=False,
             )
             aoi_data_paths.append(aoi_path)
+        # 所有时间段的新tile记录一次性写回metadata
+        flush_metadata(data_source)
+        # 同一流域所有tile共用一个mask，只生成一次
+        if mask is None:
+            mask = hpm.gen_single_mask(basin_id, basin, data_source)
         result_arr_list = []
         for time_paths in aoi_data_paths:
             for path in time_paths:
-                aoi_dataset = xr.open_dataset(hdscc.FS.open(path))
-                mask = hpm.gen_single_mask(basin_id, basin, data_source)
+                # 旧tile可能是netCDF3（scipy写出），由xarray按文件头自动选择引擎
+                aoi_dataset = xr.open_dataset(_open_hdf5(path))
                 if data_source == "gpm":
                     # 按照mask出来的四至和get_para()有关，全是.0或.5，直接输入四至就会破坏这样的性质
                     result_arr = hpm.mean_by_mask(
@@ -288,7 +439,7 @@ def grid_mean_mask(basin_id, times: list, data_source):
                 else:
                     result_arr = []
                 result_arr_list.append(result_arr)
-        result_arr_list = np.array(result_arr_list)
+        result_arr_list = np.asarray(result_arr_list, dtype=float)
         np.save(aver_npy, result_arr_list)
         hdscc.FS.put_file(aver_npy, s3_aver_npy_path)
         os.remove(aver_npy)
@@ -302,14 +453,19 @@ def concat_gpm_average(basin_id, times: list):
         gpm_hour_array = np.load(hdscc.FS.open(s3_gpm_aver_path), allow_pickle=True)
     else:
         gpm_half_hour_array, basin = grid_mean_mask(basin_id, times, "gpm")
-        gpm_hour_array = []
-        for i in np.arange(0, len(gpm_half_hour_array) - 1, 2):
-            gpm_hour_i = np.add(gpm_half_hour_array[i], gpm_half_hour_array[i + 1])
-            gpm_hour_array.append(gpm_hour_i)
+        # 相邻两个半小时相加得到小时值，多出的最后一个半小时舍去
+        half_hour_array = np.asarray(gpm_half_hour_array, dtype=float)
+        n_hours = len(half_hour_array) // 2
+        gpm_hour_array = (
+            half_hour_array[: 2 * n_hours]
+            .reshape(n_hours, 2, *half_hour_array.shape[1:])
+            .sum(axis=1)
+        )
         # temporarily fix
         if len(gpm_hour_array) % 2 != 0:
-            gpm_hour_array.extend(gpm_hour_array[-1])
-        gpm_hour_array = np.array(gpm_hour_array, dtype=object)
+            gpm_hour_array = np.concatenate(
+                [gpm_hour_array, gpm_hour_array[-1:]], axis=0
+            )
         np.save(gpm_aver_npy, gpm_hour_array)
         hdscc.FS.put_file(gpm_aver_npy, s3_gpm_aver_path)
         os.remove(gpm_aver_npy)
@@ -321,15 +477,20 @@ def concat_gpm_smap_mean_data(basin_ids: list, times: list, use_pp=False):
         hdscc.FS.open("s3://stations-origin/stations_list/pp_stations.zip")
     )
     merge_list = []
+    # 所有流域共用同一个逐小时时间轴，只生成一次
+    time_index = pd.DatetimeIndex(convert_time_slice_to_range(times))
     for basin_id in basin_ids:
         gpm_mean = concat_gpm_average(basin_id, times)
         smap_mean_mask, basin_gdf = grid_mean_mask(basin_id, times, "smap")
-        smap_mean = np.repeat(smap_mean_mask, 3, axis=1).flatten()
-        if smap_mean.shape[0] < gpm_mean.shape[0]:
-            diff = gpm_mean.shape[0] - smap_mean.shape[0]
-            smap_mean = np.pad(smap_mean, (0, diff), "edge")
-        else:
-            smap_mean = smap_mean[: gpm_mean.shape[0]]
+        # smap是3小时数据，每个值重复3次对齐到小时，再截断或用最后一个值补齐到gpm的长度
+        smap_hour = np.repeat(
+            np.asarray(smap_mean_mask, dtype=float).reshape(len(smap_mean_mask), -1),
+            3,
+            axis=1,
+        ).ravel()
+        smap_mean = smap_hour[
+            np.minimum(np.arange(gpm_mean.shape[0]), smap_hour.shape[0] - 1)
+        ]
         streamflow_arr = (read_streamflow_from_minio(times, basin_id.lstrip("basin_")))[
             "Q"
         ].to_numpy()
@@ -342,11 +503,11 @@ def concat_gpm_smap_mean_data(basin_ids: list, times: list, use_pp=False):
                 basin_gdf, pp_stas_basin, pp_stas_basin["ID"].to_list(), times[0][0]
             )
             average_rainfall_times = average_rainfall[
-                average_rainfall["TM"].isin(convert_time_slice_to_range(times))
+                average_rainfall["TM"].isin(time_index)
             ]
             temp_df = pd.DataFrame(
                 {
-                    "time": convert_time_slice_to_range(times),
+                    "time": time_index,
                     "gpm_tp(mm/h)": gpm_mean,
                     "smap(m3/m3)": smap_mean,
                     "sta_tp(mm/h)": average_rainfall_times[
@@ -358,7 +519,7 @@ def concat_gpm_smap_mean_data(basin_ids: list, times: list, use_pp=False):
         else:
             temp_df = pd.DataFrame(
                 {
-                    "time": convert_time_slice_to_range(times),
+                    "time": time_index,
                     "gpm_tp(mm/h)": gpm_mean,
                     "smap(m3/m3)": smap_mean,
                     "streamflow(m3/s)": streamflow_arr,
@@ -381,82 +542,60 @@ def convert_time_slice_to_range(time_slice_list):
     return time_range_list
 
 
+def _read_first_existing_csv(csv_paths, **kwargs):
+    """按顺序读取csv_paths中第一个存在的文件，都不存在时返回空DataFrame
+
+    直接尝试打开而不是先exists再open，找到文件只需一次请求
+    """
+    for csv_path in csv_paths:
+        try:
+            with hdscc.FS.open(csv_path) as fp:
+                return pd.read_csv(fp, index_col=None, engine="pyarrow", **kwargs)
+        except FileNotFoundError:
+            continue
+    return pd.DataFrame()
+
+
 def read_streamflow_from_minio(times: list, sta_id=""):
     # sta_id: CHN_songliao_21401550、USA_xxx_01301500
-    stream_times_df = pd.DataFrame()
+    streamflow_dfs = []
     for time_slice in times:
+        slice_range = pd.date_range(time_slice[0], time_slice[1], freq="H")
         if (pd.to_datetime("2020-01-01") > pd.to_datetime(time_slice[1])) & (
             "camels" in sta_id
         ):
             stcd = sta_id.split("_")[-1]
             zq_1h_path = f"datasets-origin/camels-hourly/data/usgs_streamflow_csv/{stcd}-usgs-hourly.csv"
-            if hdscc.FS.exists(zq_1h_path):
-                streamflow_df = pd.read_csv(
-                    hdscc.FS.open(zq_1h_path), index_col=None, parse_dates=["date"]
-                )
-                streamflow_df = streamflow_df[
-                    streamflow_df["date"].isin(
-                        pd.date_range(time_slice[0], time_slice[1], freq="H")
-                    )
-                ]
+            streamflow_df = _read_first_existing_csv(
+                [zq_1h_path], usecols=["date", "QObs(mm/h)"], parse_dates=["date"]
+            )
+            if not streamflow_df.empty:
+                streamflow_df = streamflow_df[streamflow_df["date"].isin(slice_range)]
                 streamflow_df = streamflow_df.rename(
                     columns={"date": "TM", "QObs(mm/h)": "Q"}
                 )
                 streamflow_df = streamflow_df[["TM", "Q"]]
-            else:
-                streamflow_df = pd.DataFrame()
         else:
             if "camels" in sta_id:
                 stcd = sta_id.split("_")[-1]
                 sta_id = f"USA_usgs_{stcd}"
-            zq_1h_path = (
-                f"s3://stations-origin/zq_stations/hour_data/1h/zq_{sta_id}.csv"
-            )
-            zq_6h_path = (
-                f"s3://stations-origin/zq_stations/hour_data/6h/zq_{sta_id}.csv"
-            )
-            zq_1d_path = f"s3://stations-origin/zq_stations/day_data/1d/zq_{sta_id}.csv"
-            zz_1h_path = (
-                f"s3://stations-origin/zz_stations/hour_data/1h/zz_{sta_id}.csv"
-            )
-            zz_6h_path = (
-                f"s3://stations-origin/zz_stations/hour_data/6h/zz_{sta_id}.csv"
-            )
-            zz_1d_path = f"s3://stations-origin/zz_stations/day_data/1d/zz_{sta_id}.csv"
-            if hdscc.FS.exists(zq_1h_path):
-                streamflow_df = pd.read_csv(
-                    hdscc.FS.open(zq_1h_path), index_col=None, parse_dates=["TM"]
-                )
-            elif hdscc.FS.exists(zq_6h_path):
-                streamflow_df = pd.read_csv(
-                    hdscc.FS.open(zq_6h_path), index_col=None, parse_dates=["TM"]
-                )
-            elif hdscc.FS.exists(zz_1h_path):
-                streamflow_df = pd.read_csv(
-                    hdscc.FS.open(zz_1h_path), index_col=None, parse_dates=["TM"]
-                )
-            elif hdscc.FS.exists(zz_6h_path):
-                streamflow_df = pd.read_csv(
-                    hdscc.FS.open(zz_6h_path), index_col=None, parse_dates=["TM"]
-                )
-            elif hdscc.FS.exists(zz_1d_path):
-                streamflow_df = pd.read_csv(
-                    hdscc.FS.open(zz_1d_path), index_col=None, parse_dates=["TM"]
-                )
-            elif hdscc.FS.exists(zq_1d_path):
-                streamflow_df = pd.read_csv(
-                    hdscc.FS.open(zq_1d_path), index_col=None, parse_dates=["TM"]
-                )
-            else:
-                streamflow_df = pd.DataFrame()
-            streamflow_df = streamflow_df[
-                streamflow_df["TM"].isin(
-                    pd.date_range(time_slice[0], time_slice[1], freq="H")
-                )
+            # 按优先级依次查找的流量文件
+            candidate_paths = [
+                f"s3://stations-origin/zq_stations/hour_data/1h/zq_{sta_id}.csv",
+                f"s3://stations-origin/zq_stations/hour_data/6h/zq_{sta_id}.csv",
+                f"s3://stations-origin/zz_stations/hour_data/1h/zz_{sta_id}.csv",
+                f"s3://stations-origin/zz_stations/hour_data/6h/zz_{sta_id}.csv",
+                f"s3://stations-origin/zz_stations/day_data/1d/zz_{sta_id}.csv",
+                f"s3://stations-origin/zq_stations/day_data/1d/zq_{sta_id}.csv",
             ]
+            streamflow_df = _read_first_existing_csv(
+                candidate_paths, usecols=["TM", "Q"], parse_dates=["TM"]
+            )
+            streamflow_df = streamflow_df[streamflow_df["TM"].isin(slice_range)]
             streamflow_df = streamflow_df[["TM", "Q"]]
-        stream_times_df = pd.concat([stream_times_df, streamflow_df])
-    return stream_times_df
+        streamflow_dfs.append(streamflow_df)
+    # 各时间段的结果最后一次性拼接
+    return pd.concat([pd.DataFrame(), *streamflow_dfs])
 
 
 """
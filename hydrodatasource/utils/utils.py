@@ -1,15 +1,16 @@
 import re
 import numpy as np
 import geopandas as gpd
-from netCDF4 import Dataset, date2num, num2date
+from netCDF4 import Dataset
 import time
 from datetime import datetime, timedelta
 import pandas as pd
 import pint
 import xarray as xr
 import contextlib
+import weakref
 import tempfile
-from ..configs.config import FS
+from ..configs.config import FS, S3
 
 # please don't remove the following line although it seems not used
 import pint_xarray  # noqa
@@ -30,7 +31,9 @@ def creatspinc(value, data_vars, lats, lons, starttime, filename, resolution):
     latitudes = gridspi.createVariable("lat", np.float32, ("lat",))
     longitudes = gridspi.createVariable("lon", np.float32, ("lon",))
 
-    # Create the actual variable
+    # Create the actual variable; chunk along time so per-slab reads stay small
+    nt, nlon, nlat = value[0].shape
+    chunksizes = (min(24, nt), min(64, nlon), min(64, nlat))
     for var, attr in data_vars.items():
         gridspi.createVariable(
             var,
@@ -40,6 +43,10 @@ def creatspinc(value, data_vars, lats, lons, starttime, filename, resolution):
                 "lon",
                 "lat",
             ),
+            chunksizes=chunksizes,
+            zlib=True,
+            complevel=1,
+            shuffle=True,
         )
 
     # Global Attributes
@@ -58,22 +65,16 @@ def creatspinc(value, data_vars, lats, lons, starttime, filename, resolution):
     longitudes[:] = lons
 
     # Fill in times
-    dates = []
     if resolution == "daily":
-        for n in range(value[0].shape[0]):
-            dates.append(starttime + n)
-        times[:] = dates[:]
+        times[:] = np.asarray(starttime + np.arange(nt)).astype(np.float64)
 
     elif resolution == "6-hourly":
-        # for n in range(value[0].shape[0]):
-        #     dates.append(starttime + (n+1) * np.timedelta64(6, 'h'))
-
-        for n in range(value[0].shape[0]):
-            dates.append(starttime + (n + 1) * timedelta(hours=6))
-
-        times[:] = date2num(dates, units=times.units, calendar=times.calendar)
-        # print 'time values (in units %s): ' % times.units +'\n', times[:]
-        dates = num2date(times[:], units=times.units, calendar=times.calendar)
+        dates = np.datetime64(starttime, "h") + np.arange(1, nt + 1) * np.timedelta64(
+            6, "h"
+        )
+        times[:] = (dates - np.datetime64("1970-01-01T00", "h")) / np.timedelta64(
+            1, "D"
+        )
 
     # Fill in values
     i = 0
@@ -87,43 +88,19 @@ def creatspinc(value, data_vars, lats, lons, starttime, filename, resolution):
 
 
 def regen_box(bbox, resolution, offset):
-    lx = bbox[0]
-    rx = bbox[2]
-    LLON = np.round(
-        int(lx)
-        + resolution * int((lx - int(lx)) / resolution + 0.5)
-        + offset
-        * (int(lx * 10) / 10 + offset - lx)
-        / abs(int(lx * 10) // 10 + offset - lx + 0.0000001),
-        3,
-    )
-    RLON = np.round(
-        int(rx)
-        + resolution * int((rx - int(rx)) / resolution + 0.5)
-        - offset
-        * (int(rx * 10) / 10 + offset - rx)
-        / abs(int(rx * 10) // 10 + offset - rx + 0.0000001),
-        3,
-    )
-
-    by = bbox[1]
-    ty = bbox[3]
-    BLAT = np.round(
-        int(by)
-        + resolution * int((by - int(by)) / resolution + 0.5)
-        + offset
-        * (int(by * 10) / 10 + offset - by)
-        / abs(int(by * 10) // 10 + offset - by + 0.0000001),
-        3,
-    )
-    TLAT = np.round(
-        int(ty)
-        + resolution * int((ty - int(ty)) / resolution + 0.5)
-        - offset
-        * (int(ty * 10) / 10 + offset - ty)
-        / abs(int(ty * 10) // 10 + offset - ty + 0.0000001),
-        3,
+    # [west, south, east, north]; the offset is added on the west/south edges
+    # and subtracted on the east/north edges
+    arr = np.array([bbox[0], bbox[1], bbox[2], bbox[3]], dtype=np.float64)
+    sign = np.array([1.0, 1.0, -1.0, -1.0])
+    int_part = np.trunc(arr)
+    tenths = np.trunc(arr * 10)
+    snapped = int_part + resolution * np.trunc((arr - int_part) / resolution + 0.5)
+    adjust = (
+        offset
+        * (tenths / 10 + offset - arr)
+        / np.abs(np.floor_divide(tenths, 10) + offset - arr + 0.0000001)
     )
+    LLON, BLAT, RLON, TLAT = np.round(snapped + sign * adjust, 3)
 
     # print(LLON,BLAT,RLON,TLAT)
     return [LLON, BLAT, RLON, TLAT]
@@ -140,16 +117,18 @@ def cf2datetime(ds):
     ds = ds.copy()
     time_tmp1 = ds.indexes["time"]
     attrs = ds.coords["time"].attrs
-    time_tmp2 = []
-    for i in range(time_tmp1.shape[0]):
-        tmp = time_tmp1[i]
-        a = str(tmp.year).zfill(4)
-        b = str(tmp.month).zfill(2)
-        c = str(tmp.day).zfill(2)
-        d = str(tmp.hour).zfill(2)
-        e = str(tmp.minute).zfill(2)
-        f = str(tmp.second).zfill(2)
-        time_tmp2.append(np.datetime64(f"{a}-{b}-{c} {d}:{e}:{f}.00000000"))
+    # rebuild the times from their components (works for cftime and numpy times),
+    # dropping anything below one second
+    time_tmp2 = pd.to_datetime(
+        {
+            "year": np.asarray(time_tmp1.year),
+            "month": np.asarray(time_tmp1.month),
+            "day": np.asarray(time_tmp1.day),
+            "hour": np.asarray(time_tmp1.hour),
+            "minute": np.asarray(time_tmp1.minute),
+            "second": np.asarray(time_tmp1.second),
+        }
+    ).values.astype("datetime64[ns]")
     ds = ds.assign_coords(time=time_tmp2)
     ds.coords["time"].attrs = attrs
 
@@ -174,12 +153,40 @@ def generate_time_intervals(start_date, end_date):
 
 def _convert_target_unit(target_unit):
     """Convert user-friendly unit to standard unit for internal calculations."""
-    if match := re.match(r"mm/(\d+)(h|d)", target_unit):
+    if match := _CUSTOM_UNIT_PATTERN.match(target_unit):
         num, unit = match.groups()
         return int(num), unit
     return None, None
 
 
+# Regular expression to match units with numbers, e.g. mm/3h, mm/5d
+_CUSTOM_UNIT_PATTERN = re.compile(r"mm/(\d+)(h|d)")
+# id(area) -> (weakref to area, data arrays, units, quantified area)
+_QUANTIFIED_AREA = {}
+
+
+def _quantify_area(area):
+    """Quantify an area Dataset once, reusing it while data and units are unchanged."""
+    # the underlying arrays are held in the entry, so an identity match means the
+    # variables were not reassigned (no id reuse after garbage collection)
+    data = tuple(area.variables[var]._data for var in area.data_vars)
+    units = tuple(area[var].attrs.get("units") for var in area.data_vars)
+    key = id(area)
+    cached = _QUANTIFIED_AREA.get(key)
+    if (
+        cached is not None
+        and cached[0]() is area
+        and len(cached[1]) == len(data)
+        and all(old is new for old, new in zip(cached[1], data))
+        and cached[2] == units
+    ):
+        return cached[3]
+    quantified = area.pint.quantify()
+    ref = weakref.ref(area, lambda _, key=key: _QUANTIFIED_AREA.pop(key, None))
+    _QUANTIFIED_AREA[key] = (ref, data, units, quantified)
+    return quantified
+
+
 def streamflow_unit_conv(streamflow, area, target_unit="mm/d", inverse=False):
     """Convert the unit of streamflow data to mm/xx(time) for a basin or inverse.
 
@@ -213,9 +220,6 @@ def streamflow_unit_conv(streamflow, area, target_unit="mm/d", inverse=False):
     else:
         standard_unit = target_unit
         conversion_factor = 1
-    # Regular expression to match units with numbers
-    custom_unit_pattern = re.compile(r"mm/(\d+)(h|d)")
-
     # Function to handle the conversion for numpy and pandas
     def np_pd_conversion(streamflow, area, target_unit, inverse, conversion_factor):
         if not inverse:
@@ -231,7 +235,7 @@ def streamflow_unit_conv(streamflow, area, target_unit="mm/d", inverse=False):
         )
         if not inverse:
             if not (
-                custom_unit_pattern.match(target_unit)
+                _CUSTOM_UNIT_PATTERN.match(target_unit)
                 or re.match(r"mm/(?!\d)", target_unit)
             ):
                 raise ValueError(
@@ -239,7 +243,7 @@ def streamflow_unit_conv(streamflow, area, target_unit="mm/d", inverse=False):
                 )
 
             q = streamflow.pint.quantify()
-            a = area.pint.quantify()
+            a = _quantify_area(area)
             r = q[list(q.keys())[0]] / a[list(a.keys())[0]]
             # result = r.pint.to(target_unit).to_dataset(name=list(q.keys())[0])
             result = (r.pint.to(standard_unit) * conversion_factor).to_dataset(
@@ -251,7 +255,7 @@ def streamflow_unit_conv(streamflow, area, target_unit="mm/d", inverse=False):
             return result_
         else:
             if streamflow_units:
-                if custom_match := custom_unit_pattern.match(streamflow_units):
+                if custom_match := _CUSTOM_UNIT_PATTERN.match(streamflow_units):
                     num, unit = custom_match.groups()
                     if unit == "h":
                         standard_unit = "mm/h"
@@ -269,7 +273,7 @@ def streamflow_unit_conv(streamflow, area, target_unit="mm/d", inverse=False):
                 r = streamflow.pint.quantify()
             if target_unit not in ["m^3/s", "m3/s"]:
                 raise ValueError("target_unit should be 'm^3/s'")
-            a = area.pint.quantify()
+            a = _quantify_area(area)
             q = r[list(r.keys())[0]] * a[list(a.keys())[0]]
             result = q.pint.to(target_unit).to_dataset(name=list(r.keys())[0])
             # dequantify to get normal xr_dataset
@@ -293,7 +297,7 @@ def streamflow_unit_conv(streamflow, area, target_unit="mm/d", inverse=False):
         )
 
 
-def minio_file_list(minio_folder_url):
+def minio_file_list(minio_folder_url, limit=None):
     """
     Get all filenames in a specified directory on MinIO.
 
@@ -301,6 +305,8 @@ def minio_file_list(minio_folder_url):
     ----------
     minio_folder_url : str
         the minio file url, must start with s3://
+    limit : int, optional
+        only list at most this many objects, by default None (list all)
 
     Returns
     -------
@@ -308,6 +314,27 @@ def minio_file_list(minio_folder_url):
     """
     # Get the list of files in the directory
     try:
+        if limit is not None:
+            # ask the server for only the first pages instead of the whole listing;
+            # MaxKeys also counts subfolders and "dir/" markers, so keep paging
+            # until enough real files are found
+            bucket, _, prefix = minio_folder_url.replace("s3://", "").partition("/")
+            prefix = prefix.rstrip("/") + "/" if prefix else ""
+            kwargs = {"Bucket": bucket, "Prefix": prefix, "Delimiter": "/"}
+            files = []
+            while len(files) < limit:
+                response = S3.list_objects_v2(
+                    MaxKeys=max(limit - len(files), 10), **kwargs
+                )
+                files.extend(
+                    obj["Key"].split("/")[-1]
+                    for obj in response.get("Contents", [])
+                    if not obj["Key"].endswith("/")
+                )
+                if not response.get("IsTruncated"):
+                    break
+                kwargs["ContinuationToken"] = response["NextContinuationToken"]
+            return files[:limit]
         # the minio folder url doesn't have to start with s3://, but we agree that it must
         # start with s3:// to distinguish between local and Minio folder directories.
         files = FS.ls(minio_folder_url)
@@ -1,12 +1,60 @@
+import functools
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
 import geopandas as gpd
 import pandas as pd
+import pytest
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.fs as pafs
 import xarray as xr
+import fsspec
 import hydrodatasource.configs.config as conf
 from hydrodatasource.reader import access_fs
 from hydrodatasource.cleaner import rain_anomaly
 
 
+@functools.lru_cache(maxsize=None)
+def _arrow_fs():
+    """pyarrow原生S3文件系统，读取时不占用GIL，只创建一次"""
+    endpoint = urlparse(conf.MINIO_PARAM["endpoint_url"])
+    return pafs.S3FileSystem(
+        access_key=conf.MINIO_PARAM["key"],
+        secret_key=conf.MINIO_PARAM["secret"],
+        endpoint_override=endpoint.netloc,
+        scheme=endpoint.scheme or "http",
+    )
+
+
+def _read_minio_csv(path):
+    """用pyarrow直接从minio读取csv"""
+    key = path.removeprefix("s3://")
+    try:
+        with _arrow_fs().open_input_stream(key) as f:
+            return pacsv.read_csv(f).to_pandas()
+    except pa.ArrowInvalid:
+        # 行尾多分隔符等不规整文件，退回pandas
+        with _arrow_fs().open_input_stream(key) as f:
+            return pd.read_csv(f, index_col=False)
+
+
+def _read_minio_shp(path):
+    """shp压缩包先缓存到本地磁盘，再用pyogrio读取，重复读取时不再下载"""
+    local_path = fsspec.open_local(
+        f"simplecache::{path}",
+        s3=conf.RO,
+        simplecache={
+            "cache_storage": os.path.join(tempfile.gettempdir(), "hydro_cache"),
+            "same_names": True,
+        },
+    )
+    return gpd.read_file(local_path, engine="pyogrio", use_arrow=True)
+
+
 def test_read_spec():
     # access_fs.spec_path("st_rain_c.csv")
     mean_forcing_nc = access_fs.spec_path(
@@ -17,14 +65,12 @@ def test_read_spec():
 
 
 def test_read_shp():
-    watershed = gpd.read_file(
-        conf.FS.open(
-            "s3://basins-origin/basin_shapefiles/basin_USA_camels_01411300.zip"
-        )
+    watershed = _read_minio_shp(
+        "s3://basins-origin/basin_shapefiles/basin_USA_camels_01411300.zip"
     )
     print(watershed)
 
-    all_watershed = gpd.read_file(conf.FS.open("s3://basins-origin/basins_shp.zip"))
+    all_watershed = _read_minio_shp("s3://basins-origin/basins_shp.zip")
     print(all_watershed)
 
 
@@ -70,7 +116,7 @@ def test_read_stations_shp():
 # TODO Rename this here and in `test_read_stations_shp`
 def _extracted_from_test_read_stations_shp_3(arg0, arg1):
     # 读取zip中的shpfiles文件
-    result = gpd.read_file(conf.FS.open(arg0))
+    result = _read_minio_shp(arg0)
     print(arg1)
     print(result)
     return result
@@ -95,69 +141,88 @@ def test_read_stations_list():
 # TODO Rename this here and in `test_read_stations_list`
 def _extracted_from_test_read_stations_list_3(arg0, arg1):
     # 读取csv文件
-    result = pd.read_csv(arg0, storage_options=conf.MINIO_PARAM, index_col=False)
+    result = _read_minio_csv(arg0)
     print(arg1)
     print(result)
     return result
 
 
 def test_read_zqstations_ts():
-    return pd.read_csv(
-        "s3://stations-origin/zq_stations/zq_CHN_songliao_10310500.csv",
-        storage_options=conf.MINIO_PARAM,
+    return _read_minio_csv(
+        "s3://stations-origin/zq_stations/zq_CHN_songliao_10310500.csv"
     )
 
 
 def test_read_reservoirs_info():
-    dams_gdf = gpd.read_file(conf.FS.open("s3://reservoirs-origin/dams.zip"))
-    rsvrs_gdf = gpd.read_file(conf.FS.open("s3://reservoirs-origin/rsvrs_shp.zip"))
+    dams_gdf = _read_minio_shp("s3://reservoirs-origin/dams.zip")
+    rsvrs_gdf = _read_minio_shp("s3://reservoirs-origin/rsvrs_shp.zip")
     return dams_gdf, rsvrs_gdf
 
 
 def test_read_river_network():
-    return gpd.read_file(conf.FS.open("s3://basins-origin/HydroRIVERS_v10_shp.zip"))
+    return _read_minio_shp("s3://basins-origin/HydroRIVERS_v10_shp.zip")
 
 
 def test_read_rsvr_ts():
-    return pd.read_csv(
-        "s3://reservoirs-origin/rr_stations/zq_CHN_songliao_10310500.csv",
-        storage_options=conf.MINIO_PARAM,
+    return _read_minio_csv(
+        "s3://reservoirs-origin/rr_stations/zq_CHN_songliao_10310500.csv"
     )
 
 
 def test_read_pp():
-    return pd.read_csv(
-        "s3://stations-origin/pp_stations/hour_data/1h/pp_CHN_songliao_10951870.csv",
-        storage_options=conf.MINIO_PARAM,
+    return _read_minio_csv(
+        "s3://stations-origin/pp_stations/hour_data/1h/pp_CHN_songliao_10951870.csv"
     )
 
 
 def test_read_zz():
-    return pd.read_csv(
-        "s3://stations-origin/zz_stations/hour_data/1h/zz_CHN_dalianxiaoku_21302120.csv",
-        storage_options=conf.MINIO_PARAM,
+    return _read_minio_csv(
+        "s3://stations-origin/zz_stations/hour_data/1h/zz_CHN_dalianxiaoku_21302120.csv"
     )
 
 
-def test_read_zq():
-    return pd.read_csv(
-        "s3://stations-origin/zq_stations/hour_data/1h/zq_USA_usgs_01181000.csv",
-        storage_options=conf.MINIO_PARAM,
+@pytest.fixture(scope="session")
+def zq_usgs_df(request):
+    # 同一份csv在多个测试中复用；首次下载后存为parquet放在pytest缓存目录，再次运行不访问minio
+    cache_file = (
+        request.config.cache.mkdir("minio_csv") / "zq_USA_usgs_01181000.parquet"
+    )
+    if cache_file.exists():
+        return pd.read_parquet(cache_file)
+    zq_df = _read_minio_csv(
+        "s3://stations-origin/zq_stations/hour_data/1h/zq_USA_usgs_01181000.csv"
     )
+    zq_df.to_parquet(cache_file)
+    return zq_df
 
 
-def test_df2ds():
-    zq_df = pd.read_csv(
-        "s3://stations-origin/zq_stations/hour_data/1h/zq_USA_usgs_01181000.csv",
-        storage_options=conf.MINIO_PARAM,
+def test_read_zq(zq_usgs_df):
+    return zq_usgs_df
+
+
+def test_df2ds(zq_usgs_df):
+    zq_df = zq_usgs_df
+    # 直接用各列的numpy数组构建，省去from_dataframe的索引处理和列复制
+    return xr.Dataset(
+        {col: ("index", zq_df[col].to_numpy()) for col in zq_df.columns},
+        coords={"index": zq_df.index.to_numpy()},
     )
-    return xr.Dataset().from_dataframe(zq_df)
 
 
 def list_csv_files(bucket_name, prefix=""):
     """List paths of all CSV files in the specified S3 bucket."""
     path = f"{bucket_name}/{prefix}" if prefix else bucket_name
-    return conf.FS.glob(f"{path}*.csv")
+    bucket, _, key_prefix = path.removeprefix("s3://").partition("/")
+    # 服务端按前缀分页列举，只返回当前层级，不必列出整个桶再过滤
+    paginator = conf.S3.get_paginator("list_objects_v2")
+    return [
+        f"{bucket}/{obj['Key']}"
+        for page in paginator.paginate(
+            Bucket=bucket, Prefix=key_prefix, Delimiter="/"
+        )
+        for obj in page.get("Contents", [])
+        if obj["Key"].endswith(".csv")
+    ]
 
 
 def process_store_csvs(source_bucket, destination_bucket, prefix=""):
@@ -166,11 +231,23 @@ def process_store_csvs(source_bucket, destination_bucket, prefix=""):
     """
     csv_files = list_csv_files(source_bucket, prefix)
 
-    for file_path in csv_files:
-        df = read_csv_to_dataframe(file_path)
+    def _process_store(file_path):
+        df = read_csv_to_df(file_path)
         df = process_dataframe(df)
         store_dataframe_to_bucket(df, destination_bucket, file_path)
 
+    # 每个文件都在等S3读写，用线程池并发，单个文件失败不影响其他文件
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        futures = {
+            executor.submit(_process_store, file_path): file_path
+            for file_path in csv_files
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Failed to process {futures[future]}: {e}")
+
 
 def read_csv_to_df(file_path):
     """Read CSV file from file_path and return as pandas DataFrame."""
@@ -200,8 +277,11 @@ def process_dataframe(df):
 def store_dataframe_to_bucket(df, bucket, file_path):
     file_name = file_path.split("/")[-1]
     destination_file_path = f"{bucket}/{file_name}"
-    with conf.FS.open(destination_file_path, mode="w") as file:
-        df.to_csv(file, index=False)
+    # 通过pyarrow原生S3上传，上传过程不占用GIL
+    with _arrow_fs().open_output_stream(
+        destination_file_path.removeprefix("s3://")
+    ) as sink:
+        sink.write(df.to_csv(index=False).encode())
 
 
 def test_read_folder():
@@ -210,39 +290,47 @@ def test_read_folder():
     process_store_csvs(source_bucket, destination_bucket)
 
 
+def _read_era5_land_zarr_info(zarr_file):
+    """读取单个zarr文件的范围、起止时间和分辨率"""
+    # 按zarr目录结构打开，只读元数据，不整体拉取对象
+    test_ds_i = xr.open_zarr(conf.FS.get_mapper(zarr_file), chunks={})
+    # 经纬度坐标单调，只取首尾和前两个值即可得到范围和分辨率
+    lon = test_ds_i["longitude"]
+    lat = test_ds_i["latitude"]
+    lon0, lon1 = lon.isel(longitude=[0, -1]).values
+    lat0, lat1 = lat.isel(latitude=[0, -1]).values
+    bbox = [min(lon0, lon1), max(lon0, lon1), max(lat0, lat1), min(lat0, lat1)]
+    start_time, end_time = test_ds_i["time"].isel(time=[0, -1]).values
+    lon_res = abs(lon.isel(longitude=slice(0, 2)).diff("longitude").item())
+    lat_res = abs(lat.isel(latitude=slice(0, 2)).diff("latitude").item())
+    return bbox, start_time, end_time, lon_res, lat_res
+
+
 def test_read_era5_land_csv():
     era5_land_zarr_files = [
         file
         for file in conf.FS.glob("s3://grids-origin/era5_land/")
         if file.endswith(".zarr")
     ]
-    bbox_list = []
-    start_time = []
-    end_list = []
-    res_lon_list = []
-    res_lat_list = []
-    for i in range(len(era5_land_zarr_files)):
-        test_ds_i = xr.open_dataset(conf.FS.open(era5_land_zarr_files[i]))
-        bbox = [
-            np.min(test_ds_i["longitude"].to_numpy()),
-            np.max(test_ds_i["longitude"].to_numpy()),
-            np.max(test_ds_i["latitude"].to_numpy()),
-            np.min(test_ds_i["latitude"].to_numpy()),
-        ]
-        bbox_list.append(bbox)
-        start_time.append(test_ds_i["time"].to_numpy()[0])
-        end_list.append(test_ds_i["time"].to_numpy()[-1])
-        lon_res = abs(np.diff(test_ds_i["longitude"].to_numpy())[0])
-        res_lon_list.append(lon_res)
-        lat_res = abs(np.diff(test_ds_i["latitude"].to_numpy())[0])
-        res_lat_list.append(lat_res)
+    # 逐个文件打开都要等一次元数据往返，用线程池并发读取
+    n = len(era5_land_zarr_files)
+    bbox = np.empty((n, 4), dtype=np.float64)
+    time_start = np.empty(n, dtype="datetime64[ns]")
+    time_end = np.empty_like(time_start)
+    res_lon = np.empty(n)
+    res_lat = np.empty(n)
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        for i, info in enumerate(
+            executor.map(_read_era5_land_zarr_info, era5_land_zarr_files)
+        ):
+            bbox[i], time_start[i], time_end[i], res_lon[i], res_lat[i] = info
     test_pd = pd.DataFrame(
         {
-            "bbox": bbox_list,
-            "time_start": start_time,
-            "time_end": end_list,
-            "res_lon": lon_res,
-            "res_lat": lat_res,
+            "bbox": bbox.tolist(),
+            "time_start": time_start,
+            "time_end": time_end,
+            "res_lon": res_lon,
+            "res_lat": res_lat,
             "path": ["s3://" + file for file in era5_land_zarr_files],
         }
     )
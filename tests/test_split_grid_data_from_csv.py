@@ -88,5 +88,6 @@ def test_read_topo_data():
     for station in paths:
         sta_id = dams_shp["ID"][dams_shp.index == station].to_list()[0]
         rr_path = "s3://reservoirs-origin/rr_stations/" + sta_id + ".csv"
-        rr_df = pd.read_csv(rr_path, storage_options=conf.MINIO_PARAM)
+        with conf.FS.open(rr_path, mode="rb") as f:
+            rr_df = pd.read_csv(f)
         print(rr_df)
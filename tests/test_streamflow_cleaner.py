@@ -14,6 +14,7 @@ import matplotlib.pyplot as plt
 import glob
 from tqdm import tqdm
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 def test_anomaly_process():
     # 测试径流数据处理功能，单独处理csv文件，修改该过程可实现文件夹批处理多个文件
@@ -25,6 +26,24 @@ def test_anomaly_process():
     print(cleaner.processed_df)
     cleaner.processed_df.to_csv("/ftproot/tests_stations_anomaly_detection/streamflow_cleaner/21312150.csv",index=False)
 
+def _process_one(csv_file, output_folder):
+    # 单个文件的清洗流程，放在模块层级以便多进程调用
+    try:
+        # 读取并处理每个CSV文件
+        cleaner = StreamflowCleaner(csv_file,window_size=7,cutoff_frequency=0.1,iterations=2,cwt_row=1)#国内window_size=14,stride=1,cutoff_frequency=0.035,time_step=1.0,iterations=3,sampling_rate=1.0,order=5,cwt_row=2,
+        methods = ["EMA"]
+        cleaner.anomaly_process(methods)
+
+        # 确定输出文件路径
+        output_file = os.path.join(output_folder, os.path.basename(csv_file))
+
+        # 保存处理后的数据
+        cleaner.processed_df.to_csv(output_file, index=False)
+
+        return f"Processed {csv_file} and saved to {output_file}"
+    except Exception as e:
+        return f"Error processing {csv_file}: {e}"
+
 def test_anomaly_process_folder():
     input_folder = "/ftproot/tests_stations_anomaly_detection/streamflow_cleaner/"
     output_folder = "/ftproot/tests_stations_anomaly_detection/streamflow_cleaner/"
@@ -32,22 +51,11 @@ def test_anomaly_process_folder():
     # 获取输入文件夹中所有CSV文件的路径
     csv_files = glob.glob(os.path.join(input_folder, "*.csv"))
 
-    for csv_file in tqdm(csv_files):
-        try:
-            # 读取并处理每个CSV文件
-            cleaner = StreamflowCleaner(csv_file,window_size=7,cutoff_frequency=0.1,iterations=2,cwt_row=1)#国内window_size=14,stride=1,cutoff_frequency=0.035,time_step=1.0,iterations=3,sampling_rate=1.0,order=5,cwt_row=2,
-            methods = ["EMA"]
-            cleaner.anomaly_process(methods)
-            
-            # 确定输出文件路径
-            output_file = os.path.join(output_folder, os.path.basename(csv_file))
-
-            # 保存处理后的数据
-            cleaner.processed_df.to_csv(output_file, index=False)
-
-            print(f"Processed {csv_file} and saved to {output_file}")
-        except Exception as e:
-            print(f"Error processing {csv_file}: {e}")
+    # 各文件相互独立且清洗以计算为主，用多进程并行处理
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        futures = {executor.submit(_process_one, csv_file, output_folder): csv_file for csv_file in csv_files}
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            print(future.result())
 
 def test_process_backtrack():
     # 测试径流数据反推处理功能
@@ -241,3 +241,33 @@ def test_is_minio_folder():
     print(is_minio_folder(minio_folder_url))
     minio_folder_url = "s3://basins-interim/timeseries/1D_units_info.json"
     print(is_minio_folder(minio_folder_url))
+
+
+def test_streamflow_unit_conv_area_reassigned():
+    # the quantified area is cached per object; reassigning its data must not reuse it
+    streamflow = xr.Dataset(
+        {
+            "streamflow": xr.DataArray(
+                np.array([[1.0, 1.0]]),
+                dims=["time", "basin"],
+                attrs={"units": "m^3/s"},
+            )
+        }
+    )
+    area = xr.Dataset(
+        {
+            "area": xr.DataArray(
+                np.array([1.0, 2.0]), dims=["basin"], attrs={"units": "km^2"}
+            )
+        }
+    )
+    result = streamflow_unit_conv(streamflow, area, "mm/d")
+    np.testing.assert_allclose(result["streamflow"].values, [[86.4, 43.2]])
+
+    area["area"] = ("basin", np.array([1000.0, 2000.0]), {"units": "km^2"})
+    result = streamflow_unit_conv(streamflow, area, "mm/d")
+    np.testing.assert_allclose(result["streamflow"].values, [[0.0864, 0.0432]])
+
+    area["area"] = ("basin", np.array([1.0, 2.0]), {"units": "km^2"})
+    result = streamflow_unit_conv(streamflow, area, "mm/d")
+    np.testing.assert_allclose(result["streamflow"].values, [[86.4, 43.2]])